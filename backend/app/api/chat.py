@@ -9,14 +9,15 @@ import time
 from typing import Dict, Any
 import structlog
 from fastapi import APIRouter, HTTPException, Depends, Body, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 
 from app.core.schemas import ChatQuery, ChatResponse, ErrorResponse, ChatStats
 from app.services.chat_service import get_chat_service, ChatService, ChatServiceError
 
 logger = structlog.get_logger(__name__)
 
-router = APIRouter()
+# Respuestas serializadas con orjson (más rápido que el encoder json estándar)
+router = APIRouter(default_response_class=ORJSONResponse)
 
 
 @router.post(
@@ -165,6 +166,65 @@ async def quick_chat(
         )
 
 
+@router.post(
+    "/chat/stream",
+    summary="Chat Médico en Streaming",
+    description="""
+    Versión en streaming del endpoint de chat.
+    
+    La respuesta se entrega como texto plano a medida que GPT-4 la genera.
+    La intención, confianza y número de fuentes se envían en los headers
+    `X-Intent`, `X-Confidence` y `X-Sources-Count`.
+    """
+)
+async def chat_query_stream(
+    query_data: ChatQuery = Body(...),
+    chat_service: ChatService = Depends(get_chat_service)
+):
+    """
+    Procesar consulta médica entregando la respuesta en streaming.
+    
+    Args:
+        query_data: Datos de la consulta (query, max_results, filters, etc.)
+        chat_service: Servicio de chat inyectado
+        
+    Returns:
+        StreamingResponse con el texto de la respuesta
+        
+    Raises:
+        HTTPException: Si la consulta falla antes de iniciar la generación
+    """
+    try:
+        logger.info("Processing streaming chat query", query=query_data.query)
+        
+        if len(query_data.query.strip()) < 3:
+            raise HTTPException(
+                status_code=400,
+                detail="La consulta debe tener al menos 3 caracteres"
+            )
+        
+        streaming_response = await chat_service.stream_chat_query(query_data)
+        
+        return StreamingResponse(
+            streaming_response.tokens,
+            media_type="text/plain; charset=utf-8",
+            headers=streaming_response.headers
+        )
+        
+    except HTTPException:
+        raise
+        
+    except ChatServiceError as e:
+        logger.error("Chat service error",
+                    query=query_data.query,
+                    error=str(e))
+        
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error procesando consulta médica: {str(e)}"
+        )
+
+
 @router.get(
     "/chat/examples",
     summary="Ejemplos de Consultas",
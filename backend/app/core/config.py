@@ -57,12 +57,20 @@ class Settings(BaseSettings):
     EMBEDDING_MODEL_NAME: str = "sentence-transformers/all-MiniLM-L6-v2"
     VECTOR_EMBEDDING_DIMENSIONS: int = 384
     
+    # Chat Settings (Requisito 3 - Caché semántica de consultas, opcional)
+    CHAT_SEMANTIC_CACHE_ENABLED: bool = False
+    CHAT_SEMANTIC_CACHE_THRESHOLD: float = 0.92  # Similitud coseno mínima para reutilizar respuesta
+    CHAT_SEMANTIC_CACHE_TTL: int = 300  # seconds
+    CHAT_SEMANTIC_CACHE_MAX_SIZE: int = 1024
+    
     # Document Processing Settings (PLUS Feature 4 - PDFs/Imágenes)
     DOCUMENT_UPLOAD_DIR: str = "./temp_documents"
     DOCUMENT_MAX_SIZE_MB: int = 10
     DOCUMENT_ALLOWED_EXTENSIONS: str = "pdf,jpg,jpeg,png,tiff,tif"
     OCR_LANGUAGE: str = "spa"  # Spanish for Tesseract
     OCR_MIN_CONFIDENCE: int = 60
+    OCR_METADATA_CACHE_TTL: int = 7 * 24 * 3600  # seconds; reutiliza metadata de documentos re-subidos
+    OCR_METADATA_CACHE_MAX_SIZE: int = 1024
     PDF_MAX_PAGES: int = 50
     
     # Speaker Diarization Settings (PLUS Feature 5 - Diferenciación de hablantes)
@@ -70,6 +78,9 @@ class Settings(BaseSettings):
     SPEAKER_CONFIDENCE_THRESHOLD: float = 0.7
     SPEAKER_MAX_SPEAKERS: int = 5  # Maximum number of speakers to detect
     DIARIZATION_SAMPLE_RATE: int = 16000
+    SPEAKER_AUDIO_WINDOW_SECONDS: float = 30.0  # Audio cargado por ventana; acota la memoria en llamadas largas
+    SPEAKER_FEATURE_CACHE_ENABLED: bool = False  # Caché en disco de características por hash del audio
+    SPEAKER_FEATURE_CACHE_DIR: str = "~/.elsol/cache"
     
     @field_validator("UPLOAD_ALLOWED_EXTENSIONS", mode="after")
     @classmethod
@@ -4,7 +4,7 @@ Define objetos de transferencia de datos (DTOs) para endpoints de API.
 """
 
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from pydantic import BaseModel, Field, field_validator, validator
 from enum import Enum
 
@@ -465,6 +465,20 @@ class DiarizationResult(BaseModel):
             if v[i].start_time < v[i-1].start_time:
                 raise ValueError("Los segmentos deben estar ordenados cronológicamente")
         return v
+    
+    def iter_segments(self, speaker: Optional[SpeakerType] = None) -> Iterator[SpeakerSegment]:
+        """
+        Recorrer los segmentos sin construir listas intermedias.
+        
+        Args:
+            speaker: Si se indica, solo se entregan los segmentos de ese hablante
+            
+        Yields:
+            Segmentos en orden cronológico
+        """
+        for segment in self.speaker_segments:
+            if speaker is None or segment.speaker == speaker:
+                yield segment
 
 
 class TranscriptionWithSpeakers(TranscriptionResponse):
@@ -10,7 +10,13 @@ Requisito 3: Chatbot vía API
 import re
 import time
 import asyncio
-from typing import Dict, Any, List, Optional, Tuple
+import functools
+from collections import OrderedDict
+from dataclasses import dataclass
+from string import Template
+from types import MappingProxyType
+from typing import AsyncIterator, Callable, Dict, Any, List, Mapping, Optional, Set, Tuple
+import numpy as np
 import structlog
 
 from app.core.config import get_settings
@@ -24,12 +30,333 @@ from app.services.openai_service import get_openai_service, OpenAIService
 logger = structlog.get_logger(__name__)
 settings = get_settings()
 
+# Tabla de normalización precomputada (acentos y signos de puntuación).
+# ',' y '.' se conservan a propósito: _TOKEN_RE y los patrones con \b ya los
+# ignoran, y quitarlos uniría decimales ("1.5 mg" -> "15 mg") y dejaría que el
+# patrón "paciente ..." capture más allá del fin de la cláusula.
+_ACCENT_TABLE = str.maketrans({
+    'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u', 'ü': 'u', 'ñ': 'n',
+    'Á': 'a', 'É': 'e', 'Í': 'i', 'Ó': 'o', 'Ú': 'u', 'Ü': 'u', 'Ñ': 'n',
+    '¿': '', '¡': '', '?': '', '!': ''
+})
+_WHITESPACE_RE = re.compile(r'\s+')
+
+_TOKEN_RE = re.compile(r'[\w-]+')
+
+# Palabras interrogativas que el patrón de nombres capitalizados no debe tomar por pacientes
+_QUESTION_WORDS = frozenset({"que", "cual", "como", "donde"})
+
+
+def _normalize_term(term: str) -> str:
+    """Normalizar término del vocabulario igual que las consultas."""
+    return term.translate(_ACCENT_TABLE).lower()
+
+
+def _index_terms(terms: Dict[str, str]) -> Tuple[Mapping[str, str], Tuple[Tuple[str, str], ...]]:
+    """
+    Indexar vocabulario médico (término normalizado -> valor canónico).
+    
+    Las palabras sueltas se resuelven con lookup O(1) por token; las frases
+    de varias palabras se buscan como subcadena en la consulta.
+    """
+    words = MappingProxyType({term: value for term, value in terms.items() if " " not in term})
+    phrases = tuple((term, value) for term, value in terms.items() if " " in term)
+    return words, phrases
+
+
+def _match_terms(
+    index: Tuple[Mapping[str, str], Tuple[Tuple[str, str], ...]],
+    tokens: List[str],
+    normalized_query: str
+) -> List[str]:
+    """Buscar términos del vocabulario en una consulta normalizada."""
+    words, phrases = index
+    found = [words[token] for token in tokens if token in words]
+    found.extend(value for phrase, value in phrases if phrase in normalized_query)
+    return list(dict.fromkeys(found))
+
+
+def _drop_contained_names(names: List[str]) -> List[str]:
+    """
+    Descartar nombres contenidos en otro nombre detectado más largo.
+    
+    El extractor devuelve el nombre completo junto con sus fragmentos ("Juan",
+    "Perez", "Juan Perez"); buscar cada fragmento traería al contexto
+    expedientes de otros pacientes con el mismo nombre o apellido.
+    """
+    word_sets = [frozenset(_normalize_term(name).split()) for name in names]
+    kept: List[str] = []
+    seen: Set[frozenset] = set()
+    for name, words in zip(names, word_sets):
+        if words in seen or any(words < other for other in word_sets):
+            continue
+        seen.add(words)
+        kept.append(name)
+    return kept
+
+
+# Vocabularios de síntomas y medicamentos comunes
+_SYMPTOM_INDEX = _index_terms({
+    _normalize_term(symptom): symptom for symptom in (
+        "dolor", "fiebre", "tos", "mareos", "nausea", "vomito",
+        "diarrea", "estreñimiento", "fatiga", "cansancio", "debilidad",
+        "dolor de cabeza", "presión alta"
+    )
+})
+_MEDICATION_INDEX = _index_terms({
+    medication: medication for medication in (
+        "aspirina", "paracetamol", "ibuprofeno", "losartan",
+        "metformina", "enalapril", "simvastatina"
+    )
+})
+
+# Presupuesto máximo de caracteres del contexto enviado a GPT-4
+_MAX_CONTEXT_CHARS = 4000
+
+# Límite de longitud de la respuesta generada
+_MAX_ANSWER_CHARS = 2000
+
+# Disclaimer médico agregado a respuestas con contenido clínico
+_MEDICAL_KEYWORDS = ("diagnóstico", "medicamento", "tratamiento", "enfermedad")
+_MEDICAL_DISCLAIMER = "\n\n⚠️ Esta información proviene de conversaciones registradas. Para decisiones médicas, consulte siempre con un profesional de la salud."
+
+_ANSWER_FALLBACK_MESSAGE = "Lo siento, no pude procesar tu consulta en este momento. Por favor, intenta reformular tu pregunta o consulta directamente con el personal médico."
+
+# Templates de prompt por intención (precompilados como string.Template en ChatService)
+_PATIENT_INFO_PROMPT = """
+Eres un asistente médico. Responde la consulta sobre el paciente basándote ÚNICAMENTE en la información médica proporcionada.
+
+INFORMACIÓN MÉDICA DISPONIBLE:
+$context
+
+PREGUNTA DEL USUARIO: $query
+
+INSTRUCCIONES:
+1. Analiza la información médica disponible
+2. Responde de manera clara y directa a la pregunta
+3. Incluye detalles relevantes como diagnóstico, síntomas y fecha si están disponibles
+4. Si la información es incompleta, menciona qué falta
+5. NUNCA inventes información que no esté en el contexto
+6. Usa un lenguaje médico profesional pero comprensible
+
+Formato de respuesta esperado:
+- Respuesta directa a la pregunta
+- Detalles médicos relevantes
+- Recomendación de consultar al médico si es necesario
+
+RESPUESTA:
+"""
+
+_CONDITION_LIST_PROMPT = """
+Basándote en la información médica proporcionada, genera una lista de pacientes que cumplen con el criterio solicitado.
+
+INFORMACIÓN MÉDICA DISPONIBLE:
+$context
+
+CONSULTA: $query
+
+INSTRUCCIONES:
+- Lista SOLO pacientes que aparezcan en la información proporcionada
+- Incluye información relevante de cada paciente (diagnóstico, fecha, síntomas)
+- Organiza la lista de manera clara y estructurada
+- Indica el número total de pacientes encontrados
+- Si no hay pacientes que cumplan el criterio, indícalo claramente
+
+RESPUESTA:
+"""
+
+_GENERAL_PROMPT = """
+Basándote en la información médica proporcionada, responde la consulta médica de manera precisa y responsable.
+
+INFORMACIÓN MÉDICA DISPONIBLE:
+$context
+
+CONSULTA: $query
+ENTIDADES DETECTADAS: $entities
+
+INSTRUCCIONES:
+- Responde basándote ÚNICAMENTE en la información proporcionada
+- Mantén un enfoque médico profesional pero accesible
+- Si la información es insuficiente, sugiere consultar al médico
+- NUNCA inventes datos médicos
+- Proporciona respuestas estructuradas y claras
+
+RESPUESTA:
+"""
+
+_SYSTEM_PROMPT = "Eres un asistente médico especializado en consultar información de expedientes médicos. Proporciona respuestas claras y útiles basándote únicamente en la información médica disponible."
+
+
+@functools.lru_cache(maxsize=512)
+def _build_filters(patient_name: Optional[str], condition: Optional[str]) -> Mapping[str, Any]:
+    """
+    Construir filtros de metadata para Chroma (memoizado).
+    
+    Retorna una vista de solo lectura porque la instancia se comparte entre consultas.
+    """
+    filters: Dict[str, Any] = {}
+    if patient_name:
+        filters["patient_name"] = {"$eq": patient_name}
+    if condition:
+        filters["diagnosis"] = {"$contains": condition}
+    return MappingProxyType(filters)
+
 
 class ChatServiceError(Exception):
     """Excepción personalizada para errores del servicio de chat."""
     pass
 
 
+@dataclass(slots=True)
+class ContextRow:
+    """Contexto recuperado del vector store, normalizado para el pipeline RAG."""
+    
+    content: str
+    conversation_id: str
+    similarity_score: float
+    patient_name: Optional[str] = None
+    diagnosis: Optional[str] = None
+    symptoms: Optional[Any] = None
+    date: Optional[str] = None
+    excerpt: str = ""
+    rank: int = 0
+    final_score: Optional[float] = None
+    
+    @classmethod
+    def from_search_result(cls, result: Dict[str, Any]) -> "ContextRow":
+        """Adaptar un resultado del vector store (dict) a ContextRow."""
+        content = result.get("content") or ""
+        return cls(
+            content=content,
+            conversation_id=result.get("conversation_id") or "unknown",
+            similarity_score=result.get("similarity_score") or 0.0,
+            patient_name=result.get("patient_name"),
+            diagnosis=result.get("diagnosis"),
+            symptoms=result.get("symptoms"),
+            date=result.get("date"),
+            excerpt=result.get("excerpt") or content[:200],
+            rank=result.get("rank") or 0,
+            final_score=result.get("final_score")
+        )
+    
+    @property
+    def score(self) -> float:
+        """Puntuación final si ya fue calculada, si no la similitud."""
+        return self.final_score if self.final_score is not None else self.similarity_score
+
+
+class SemanticQueryCache:
+    """
+    Caché en memoria de respuestas de chat indexada por embedding de consulta.
+    
+    Reutiliza una respuesta previa cuando una consulta nueva es semánticamente
+    equivalente (similitud coseno >= umbral) dentro del mismo namespace.
+    Las entradas expiran por TTL y se descartan por LRU al superar el tamaño máximo.
+    """
+    
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        ttl_seconds: float = 300,
+        max_size: int = 1024,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._clock = clock
+        self._entries: "OrderedDict[int, Tuple[Tuple[Any, ...], np.ndarray, ChatResponse, float]]" = OrderedDict()
+        self._next_key = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @staticmethod
+    def _normalize(embedding: Any) -> Optional[np.ndarray]:
+        """Convertir embedding a vector float32 con norma L2 unitaria."""
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None
+        return vector / norm
+    
+    def _evict_expired(self) -> None:
+        now = self._clock()
+        expired = [
+            key for key, (_, _, _, stored_at) in self._entries.items()
+            if now - stored_at > self.ttl_seconds
+        ]
+        for key in expired:
+            del self._entries[key]
+    
+    def lookup(self, namespace: Tuple[Any, ...], embedding: Any) -> Optional[ChatResponse]:
+        """Buscar respuesta cacheada semánticamente equivalente."""
+        self._evict_expired()
+        vector = self._normalize(embedding)
+        if vector is None:
+            return None
+        
+        candidates = [
+            (key, stored_vector) for key, (stored_namespace, stored_vector, _, _) in self._entries.items()
+            if stored_namespace == namespace and stored_vector.shape == vector.shape
+        ]
+        if not candidates:
+            return None
+        
+        similarities = np.stack([stored_vector for _, stored_vector in candidates]) @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        
+        key = candidates[best][0]
+        self._entries.move_to_end(key)
+        return self._entries[key][2]
+    
+    def store(self, namespace: Tuple[Any, ...], embedding: Any, response: ChatResponse) -> None:
+        """Guardar respuesta asociada al embedding de la consulta."""
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+        
+        self._entries[self._next_key] = (namespace, vector, response, self._clock())
+        self._next_key += 1
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class StreamingChatResponse:
+    """
+    Respuesta de chat en streaming.
+    
+    La metadata (intención, confianza, fuentes) se calcula antes de iniciar
+    la generación; el texto de la respuesta se entrega fragmento a fragmento.
+    """
+    
+    def __init__(
+        self,
+        tokens: AsyncIterator[str],
+        intent: str,
+        confidence: float,
+        sources: List[ChatSource]
+    ):
+        self.tokens = tokens
+        self.intent = intent
+        self.confidence = confidence
+        self.sources = sources
+    
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Headers HTTP con la metadata de la respuesta."""
+        return {
+            "X-Intent": self.intent,
+            "X-Confidence": f"{self.confidence:.2f}",
+            "X-Sources-Count": str(len(self.sources))
+        }
+
+
 class ChatService:
     """
     Servicio principal para el sistema de chat médico con RAG.
@@ -43,6 +370,15 @@ class ChatService:
         self.vector_service: VectorStoreService = get_vector_service()
         self.openai_service: OpenAIService = get_openai_service()
         
+        # Caché semántica opcional de respuestas completas
+        self._semantic_cache: Optional[SemanticQueryCache] = None
+        if settings.CHAT_SEMANTIC_CACHE_ENABLED:
+            self._semantic_cache = SemanticQueryCache(
+                threshold=settings.CHAT_SEMANTIC_CACHE_THRESHOLD,
+                ttl_seconds=settings.CHAT_SEMANTIC_CACHE_TTL,
+                max_size=settings.CHAT_SEMANTIC_CACHE_MAX_SIZE
+            )
+        
         # Patrones para detección de intención
         self._intent_patterns = {
             ChatIntent.PATIENT_INFO: [
@@ -74,6 +410,19 @@ class ChatService:
             ]
         }
         
+        # Patrones de cada intención precompilados en una sola alternativa
+        self._compiled_intent_patterns = [
+            (intent, re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE))
+            for intent, patterns in self._intent_patterns.items()
+        ]
+        
+        # Templates de prompt por intención, parseados una sola vez
+        self._default_prompt_template = Template(_GENERAL_PROMPT)
+        self._prompt_templates: Dict[ChatIntent, Template] = {
+            ChatIntent.PATIENT_INFO: Template(_PATIENT_INFO_PROMPT),
+            ChatIntent.CONDITION_LIST: Template(_CONDITION_LIST_PROMPT),
+        }
+        
         # Términos médicos comunes para expansión de consultas
         self._medical_terms = {
             "diabetes": ["diabetes", "diabético", "glucosa", "azúcar", "insulina"],
@@ -83,6 +432,11 @@ class ChatService:
             "covid": ["covid", "coronavirus", "sars-cov-2", "pandemia"],
             "gripe": ["gripe", "influenza", "resfriado", "catarro"]
         }
+        self._condition_index = _index_terms({
+            _normalize_term(synonym): condition
+            for condition, synonyms in self._medical_terms.items()
+            for synonym in synonyms
+        })
     
     async def process_chat_query(self, query: ChatQuery) -> ChatResponse:
         """
@@ -107,6 +461,27 @@ class ChatService:
             # 1. Analizar consulta y detectar intención
             query_analysis = await self._analyze_query(query.query)
             
+            # Consultar caché semántica (solo consultas sin filtros de usuario)
+            cache_namespace = self._cache_namespace(query, query_analysis)
+            query_embedding = None
+            if self._semantic_cache is not None and not query.filters:
+                query_embedding = await self._get_query_embedding(query_analysis.normalized_query)
+                if query_embedding is not None:
+                    cached_response = self._semantic_cache.lookup(cache_namespace, query_embedding)
+                    if cached_response is not None:
+                        processing_time = int((time.time() - start_time) * 1000)
+                        logger.info("Chat query served from semantic cache",
+                                   query=query.query,
+                                   intent=query_analysis.intent.value,
+                                   processing_time_ms=processing_time)
+                        return cached_response.model_copy(update={
+                            "query_classification": {
+                                **(cached_response.query_classification or {}),
+                                "source": "semantic_cache"
+                            },
+                            "processing_time_ms": processing_time
+                        })
+            
             # 2. Recuperar contexto relevante
             retrieved_contexts = await self._retrieve_context(
                 query_analysis, query.max_results, query.filters
@@ -119,10 +494,10 @@ class ChatService:
             # 4. Generar respuesta usando GPT-4
             answer = await self._generate_answer(query_analysis, final_context)
             
-            # 5. Preparar fuentes y respuesta final
-            sources = self._prepare_sources(ranked_contexts)
-            confidence = self._calculate_confidence(ranked_contexts, query_analysis)
-            follow_ups = self._generate_follow_up_suggestions(query_analysis)
+            # 5. Preparar fuentes, confianza y sugerencias
+            sources, confidence, follow_ups = self._prepare_response_metadata(
+                ranked_contexts, query_analysis, query.include_sources
+            )
             
             processing_time = int((time.time() - start_time) * 1000)
             
@@ -140,6 +515,9 @@ class ChatService:
                 processing_time_ms=processing_time
             )
             
+            if query_embedding is not None:
+                self._semantic_cache.store(cache_namespace, query_embedding, response)
+            
             logger.info("Chat query processed successfully",
                        query=query.query,
                        intent=query_analysis.intent.value,
@@ -160,6 +538,75 @@ class ChatService:
             
             raise ChatServiceError(error_msg) from e
     
+    def _cache_namespace(self, query: ChatQuery, analysis: QueryAnalysis) -> Tuple[Any, ...]:
+        """
+        Namespace de la caché semántica para una consulta.
+        
+        Incluye los pacientes y condiciones extraídos: dos preguntas casi
+        idénticas sobre pacientes distintos tienen embeddings muy parecidos y
+        nunca deben compartir respuesta. Los nombres se reducen a sus palabras
+        normalizadas para que "Gómez" y "Gomez" caigan en el mismo namespace.
+        """
+        patient_words = sorted({
+            word
+            for name in analysis.entities.get("patients", [])
+            for word in _normalize_term(name).split()
+        })
+        conditions = sorted(set(analysis.entities.get("conditions", [])))
+        return (
+            analysis.intent.value,
+            query.max_results,
+            query.include_sources,
+            tuple(patient_words),
+            tuple(conditions)
+        )
+    
+    async def stream_chat_query(self, query: ChatQuery) -> StreamingChatResponse:
+        """
+        Procesar consulta de chat entregando la respuesta en streaming.
+        
+        Ejecuta análisis, búsqueda y ranking igual que process_chat_query, pero
+        retorna en cuanto el contexto está listo para que el cliente reciba los
+        primeros tokens de GPT-4 sin esperar la respuesta completa.
+        
+        Args:
+            query: Consulta del usuario
+            
+        Returns:
+            Respuesta en streaming con metadata precalculada
+            
+        Raises:
+            ChatServiceError: Si el procesamiento previo a la generación falla
+        """
+        try:
+            logger.info("Processing streaming chat query", 
+                       query=query.query, 
+                       max_results=query.max_results)
+            
+            query_analysis = await self._analyze_query(query.query)
+            retrieved_contexts = await self._retrieve_context(
+                query_analysis, query.max_results, query.filters
+            )
+            ranked_contexts = self._rank_contexts(retrieved_contexts, query_analysis)
+            final_context = self._prepare_final_context(ranked_contexts)
+            
+            sources, confidence, _ = self._prepare_response_metadata(
+                ranked_contexts, query_analysis, query.include_sources
+            )
+            
+            return StreamingChatResponse(
+                tokens=self._generate_answer_stream(query_analysis, final_context),
+                intent=query_analysis.intent.value,
+                confidence=confidence,
+                sources=sources
+            )
+            
+        except Exception as e:
+            logger.error("Streaming chat query processing failed",
+                        query=query.query,
+                        error=str(e))
+            raise ChatServiceError(f"Chat query processing failed: {str(e)}") from e
+    
     async def _analyze_query(self, query: str) -> QueryAnalysis:
         """Analizar consulta y detectar intención y entidades."""
         try:
@@ -208,30 +655,41 @@ class ChatService:
                 filters={}
             )
     
+    def _prepare_response_metadata(
+        self,
+        ranked_contexts: List[ContextRow],
+        analysis: QueryAnalysis,
+        include_sources: bool
+    ) -> Tuple[List[ChatSource], float, List[str]]:
+        """Preparar fuentes, confianza y sugerencias de seguimiento."""
+        sources = self._prepare_sources(ranked_contexts) if include_sources else []
+        confidence = self._calculate_confidence(ranked_contexts, analysis)
+        
+        follow_ups = self._generate_follow_up_suggestions(analysis)
+        
+        return sources, confidence, follow_ups
+    
+    async def _get_query_embedding(self, normalized_query: str) -> Optional[List[float]]:
+        """Obtener embedding de la consulta normalizada (None si falla)."""
+        try:
+            return await self.vector_service._generate_query_embedding(normalized_query)
+        except Exception as e:
+            logger.warning("Query embedding failed", error=str(e))
+            return None
+    
     def _normalize_query(self, query: str) -> str:
         """Normalizar consulta para mejor procesamiento."""
-        # Convertir a minúsculas
-        normalized = query.lower().strip()
-        
-        # Remover acentos y caracteres especiales
-        accents = {
-            'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
-            'ñ': 'n', '¿': '', '¡': '', '?': '', '!': ''
-        }
-        for accented, normal in accents.items():
-            normalized = normalized.replace(accented, normal)
+        # Remover acentos y signos en una sola pasada, luego minúsculas
+        normalized = query.translate(_ACCENT_TABLE).lower()
         
         # Limpiar espacios extra
-        normalized = re.sub(r'\s+', ' ', normalized)
-        
-        return normalized
+        return _WHITESPACE_RE.sub(' ', normalized).strip()
     
     def _detect_intent(self, query: str) -> ChatIntent:
         """Detectar intención de la consulta usando patrones."""
-        for intent, patterns in self._intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, query, re.IGNORECASE):
-                    return intent
+        for intent, pattern in self._compiled_intent_patterns:
+            if pattern.search(query):
+                return intent
         
         # Intención por defecto
         return ChatIntent.GENERAL_QUERY
@@ -271,40 +729,16 @@ class ChatService:
             for pattern in cap_patterns:
                 matches = re.findall(pattern, original_query)
                 for match in matches:
-                    if len(match) > 2 and not match in ["Qué", "Cuál", "Cómo", "Dónde"]:
+                    if len(match) > 2 and _normalize_term(match) not in _QUESTION_WORDS:
                         found_names.add(match)
             
             entities["patients"] = list(found_names)
             
-            # Extraer condiciones médicas
-            for condition, synonyms in self._medical_terms.items():
-                for synonym in synonyms:
-                    if synonym.lower() in normalized_query:
-                        if condition not in entities["conditions"]:
-                            entities["conditions"].append(condition)
-            
-            # Extraer síntomas comunes
-            symptom_keywords = [
-                "dolor", "fiebre", "tos", "mareos", "nausea", "vomito",
-                "diarrea", "estreñimiento", "fatiga", "cansancio", "debilidad",
-                "dolor de cabeza", "presion alta", "presión alta"
-            ]
-            
-            for symptom in symptom_keywords:
-                if symptom in normalized_query:
-                    if symptom not in entities["symptoms"]:
-                        entities["symptoms"].append(symptom)
-            
-            # Extraer medicamentos comunes
-            medication_keywords = [
-                "aspirina", "paracetamol", "ibuprofeno", "losartan", 
-                "metformina", "enalapril", "simvastatina"
-            ]
-            
-            for med in medication_keywords:
-                if med in normalized_query:
-                    if med not in entities["medications"]:
-                        entities["medications"].append(med)
+            # Extraer condiciones, síntomas y medicamentos por lookup de tokens
+            tokens = _TOKEN_RE.findall(normalized_query)
+            entities["conditions"] = _match_terms(self._condition_index, tokens, normalized_query)
+            entities["symptoms"] = _match_terms(_SYMPTOM_INDEX, tokens, normalized_query)
+            entities["medications"] = _match_terms(_MEDICATION_INDEX, tokens, normalized_query)
             
             # Extraer fechas/tiempo
             time_patterns = [
@@ -348,34 +782,35 @@ class ChatService:
             if any(synonym in query.lower() for synonym in synonyms):
                 search_terms.extend(synonyms[:3])  # Top 3 sinónimos
         
-        # Remover duplicados y términos muy cortos
-        search_terms = list(set([term for term in search_terms if len(term) > 2]))
+        # Remover duplicados (preservando orden) y términos muy cortos
+        search_terms = list(dict.fromkeys(term for term in search_terms if len(term) > 2))
         
         return search_terms[:10]  # Limitar a 10 términos
     
-    def _generate_filters(self, entities: Dict[str, List[str]], intent: ChatIntent) -> Dict[str, Any]:
+    def _generate_filters(self, entities: Dict[str, List[str]], intent: ChatIntent) -> Mapping[str, Any]:
         """Generar filtros automáticos basados en entidades e intención."""
-        filters = {}
+        patient_name = None
+        condition = None
         
         # Filtros por paciente
         if entities.get("patients"):
             # Para búsquedas de paciente específico, usar filtro exacto
             if intent == ChatIntent.PATIENT_INFO and len(entities["patients"]) == 1:
-                filters["patient_name"] = {"$eq": entities["patients"][0]}
+                patient_name = entities["patients"][0]
         
         # Filtros por condición médica
         if entities.get("conditions") and intent == ChatIntent.CONDITION_LIST:
             # Para listas por condición, buscar en diagnóstico
-            filters["diagnosis"] = {"$contains": entities["conditions"][0]}
+            condition = entities["conditions"][0]
         
-        return filters
+        return _build_filters(patient_name, condition)
     
     async def _retrieve_context(
         self, 
         analysis: QueryAnalysis, 
         max_results: int,
         user_filters: Optional[Dict[str, Any]] = None
-    ) -> List[Dict[str, Any]]:
+    ) -> List[ContextRow]:
         """Recuperar contexto relevante del vector store."""
         try:
             # Combinar filtros automáticos con filtros del usuario
@@ -385,19 +820,12 @@ class ChatService:
             
             # Estrategia de búsqueda según intención
             if analysis.intent == ChatIntent.PATIENT_INFO and analysis.entities.get("patients"):
-                # Búsqueda específica por paciente
-                patient_name = analysis.entities["patients"][0]
-                results = await self.vector_service.search_by_patient(
-                    patient_name=patient_name,
-                    max_results=max_results
-                )
+                # Búsqueda específica por paciente (un nombre completo por paciente detectado)
+                patients = _drop_contained_names(analysis.entities["patients"])
+                results = await self._search_entities("patient", patients, max_results)
             elif analysis.intent == ChatIntent.CONDITION_LIST and analysis.entities.get("conditions"):
-                # Búsqueda por condición médica
-                condition = analysis.entities["conditions"][0]
-                results = await self.vector_service.search_by_condition(
-                    condition=condition,
-                    max_results=max_results
-                )
+                # Búsqueda por condición médica (todas las condiciones detectadas)
+                results = await self._search_entities("condition", analysis.entities["conditions"], max_results)
             else:
                 # Búsqueda semántica general
                 search_query = " ".join(analysis.search_terms[:3])  # Top 3 términos
@@ -412,58 +840,93 @@ class ChatService:
                         intent=analysis.intent.value,
                         results_count=len(results))
             
-            return results
+            return [ContextRow.from_search_result(result) for result in results]
             
         except Exception as e:
             logger.error("Context retrieval failed", error=str(e))
             return []
     
+    async def _search_entities(
+        self,
+        entity_type: str,
+        values: List[str],
+        max_results: int
+    ) -> List[Dict[str, Any]]:
+        """Buscar por una o varias entidades; varias entidades usan una búsqueda en lote."""
+        if len(values) == 1:
+            if entity_type == "patient":
+                return await self.vector_service.search_by_patient(
+                    patient_name=values[0],
+                    max_results=max_results
+                )
+            return await self.vector_service.search_by_condition(
+                condition=values[0],
+                max_results=max_results
+            )
+        
+        batch_results = await self.vector_service.search_batch([
+            {"type": entity_type, "value": value, "max_results": max_results}
+            for value in values
+        ])
+        
+        # Aplanar resultados evitando conversaciones duplicadas
+        combined: Dict[Any, Dict[str, Any]] = {}
+        for results in batch_results:
+            for context in results:
+                key = context.get("conversation_id")
+                if not key or key == "unknown":
+                    key = id(context)
+                current = combined.get(key)
+                if current is None or context.get("similarity_score", 0.0) > current.get("similarity_score", 0.0):
+                    combined[key] = context
+        
+        return list(combined.values())
+    
     def _rank_contexts(
         self, 
-        contexts: List[Dict[str, Any]], 
+        contexts: List[ContextRow], 
         analysis: QueryAnalysis
-    ) -> List[Dict[str, Any]]:
+    ) -> List[ContextRow]:
         """Ordenar contextos por relevancia múltiple."""
         try:
-            # Agregar puntuaciones adicionales
-            for context in contexts:
-                base_score = context.get("similarity_score", 0.0)
-                
-                # Bonus por coincidencia exacta de entidades
-                entity_bonus = 0.0
-                content = context.get("content", "").lower()
-                
-                # Bonus por nombres de pacientes
-                for patient in analysis.entities.get("patients", []):
-                    if patient.lower() in content:
-                        entity_bonus += 0.1
-                
-                # Bonus por condiciones médicas
-                for condition in analysis.entities.get("conditions", []):
-                    if condition.lower() in content:
-                        entity_bonus += 0.15
-                
-                # Bonus por síntomas
-                for symptom in analysis.entities.get("symptoms", []):
-                    if symptom.lower() in content:
-                        entity_bonus += 0.05
-                
-                # Bonus por fecha reciente (placeholder)
-                date_bonus = 0.0
-                if context.get("date"):
-                    # TODO: Implementar lógica de fechas
-                    date_bonus = 0.02
-                
-                # Puntuación final
-                final_score = base_score + entity_bonus + date_bonus
-                context["final_score"] = min(final_score, 1.0)  # Cap at 1.0
+            if not contexts:
+                return []
+            
+            base_scores = np.array(
+                [c.similarity_score for c in contexts], dtype=np.float64
+            )
+            contents = np.array([c.content.lower() for c in contexts], dtype=str)
+            
+            # Bonus por coincidencia exacta de entidades (pacientes, condiciones, síntomas)
+            terms: List[str] = []
+            weights: List[float] = []
+            for entity_type, weight in (("patients", 0.1), ("conditions", 0.15), ("symptoms", 0.05)):
+                for entity in analysis.entities.get(entity_type, []):
+                    terms.append(entity.lower())
+                    weights.append(weight)
+            
+            entity_bonus = np.zeros(len(contexts))
+            if terms:
+                # Matriz de coincidencias (términos x contextos)
+                hits = np.stack([np.char.find(contents, term) >= 0 for term in terms])
+                entity_bonus = np.asarray(weights) @ hits
+            
+            # Bonus por fecha reciente (placeholder)
+            # TODO: Implementar lógica de fechas
+            date_bonus = np.array([0.02 if c.date else 0.0 for c in contexts])
+            
+            # Puntuación final (cap at 1.0)
+            final_scores = np.minimum(base_scores + entity_bonus + date_bonus, 1.0)
+            for context, final_score in zip(contexts, final_scores.tolist()):
+                context.final_score = final_score
             
             # Ordenar por puntuación final
-            ranked = sorted(contexts, key=lambda x: x.get("final_score", 0), reverse=True)
+            order = np.argsort(-final_scores, kind="stable")
+            ranked = [contexts[i] for i in order]
             
             logger.debug("Context ranking completed",
                         contexts_count=len(ranked),
-                        top_score=ranked[0].get("final_score", 0) if ranked else 0)
+                        top_score=ranked[0].final_score)
             
             return ranked
             
@@ -471,19 +934,21 @@ class ChatService:
             logger.warning("Context ranking failed", error=str(e))
             return contexts
     
-    def _prepare_final_context(self, ranked_contexts: List[Dict[str, Any]]) -> str:
+    def _prepare_final_context(self, ranked_contexts: List[ContextRow]) -> str:
         """Preparar contexto final para generación de respuesta."""
         if not ranked_contexts:
             return "No se encontró información relevante en las conversaciones médicas."
         
-        context_parts = []
+        context_parts: List[str] = []
+        used = 0
+        truncated = False
         
         for i, context in enumerate(ranked_contexts[:5]):  # Top 5 contextos
-            patient_name = context.get("patient_name", "Paciente no identificado")
-            date = context.get("date", "Fecha no disponible")
-            content = context.get("content", "")
-            diagnosis = context.get("diagnosis", "No especificado")
-            symptoms = context.get("symptoms", "No especificados")
+            patient_name = context.patient_name or "Paciente no identificado"
+            date = context.date or "Fecha no disponible"
+            content = context.content
+            diagnosis = context.diagnosis or "No especificado"
+            symptoms = context.symptoms or "No especificados"
             
             context_part = f"""
 CONVERSACIÓN {i + 1}:
@@ -491,40 +956,51 @@ Paciente: {patient_name}
 Fecha: {date}
 Diagnóstico: {diagnosis}
 Síntomas: {symptoms}
-Relevancia: {context.get('similarity_score', context.get('final_score', 0)):.2f}
+Relevancia: {context.similarity_score:.2f}
 Contenido completo: {content[:800]}{'...' if len(content) > 800 else ''}
 """
+            # Limitar tamaño total del contexto sin formatear los bloques restantes
+            if used + len(context_part) > _MAX_CONTEXT_CHARS:
+                if not context_parts:
+                    context_parts.append(context_part[:_MAX_CONTEXT_CHARS])
+                truncated = True
+                break
+            
             context_parts.append(context_part)
+            used += len(context_part) + 1  # Separador entre bloques
         
         final_context = "\n".join(context_parts)
-        
-        # Limitar tamaño total del contexto
-        if len(final_context) > 4000:
-            final_context = final_context[:4000] + "\n\n[Contexto truncado...]"
+        if truncated:
+            final_context += "\n\n[Contexto truncado...]"
         
         return final_context
     
+    def _build_answer_messages(self, analysis: QueryAnalysis, context: str) -> List[Dict[str, str]]:
+        """Construir mensajes para GPT-4 según intención y contexto."""
+        # Seleccionar prompt según intención
+        prompt_template = self._get_prompt_template(analysis.intent)
+        
+        # Preparar prompt final (el template ya está parseado)
+        full_prompt = prompt_template.substitute(
+            query=analysis.original_query,
+            context=context,
+            entities=", ".join([
+                f"{k}: {', '.join(v)}" for k, v in analysis.entities.items() if v
+            ])
+        )
+        
+        return [
+            {"role": "system", "content": _SYSTEM_PROMPT},
+            {"role": "user", "content": full_prompt}
+        ]
+    
     async def _generate_answer(self, analysis: QueryAnalysis, context: str) -> str:
         """Generar respuesta usando GPT-4 con contexto médico."""
         try:
-            # Seleccionar prompt según intención
-            prompt_template = self._get_prompt_template(analysis.intent)
-            
-            # Preparar prompt final
-            full_prompt = prompt_template.format(
-                query=analysis.original_query,
-                context=context,
-                intent=analysis.intent.value,
-                entities=", ".join([
-                    f"{k}: {', '.join(v)}" for k, v in analysis.entities.items() if v
-                ])
-            )
+            messages = self._build_answer_messages(analysis, context)
             
             # Generar respuesta usando OpenAI (método específico para chat)
-            response = await self.openai_service._call_openai_chat_api([
-                {"role": "system", "content": "Eres un asistente médico especializado en consultar información de expedientes médicos. Proporciona respuestas claras y útiles basándote únicamente en la información médica disponible."},
-                {"role": "user", "content": full_prompt}
-            ])
+            response = await self.openai_service._call_openai_chat_api(messages)
             
             # Validar y limpiar respuesta
             validated_response = self._validate_response(response, analysis)
@@ -533,74 +1009,47 @@ Contenido completo: {content[:800]}{'...' if len(content) > 800 else ''}
             
         except Exception as e:
             logger.error("Answer generation failed", error=str(e))
-            return "Lo siento, no pude procesar tu consulta en este momento. Por favor, intenta reformular tu pregunta o consulta directamente con el personal médico."
+            return _ANSWER_FALLBACK_MESSAGE
     
-    def _get_prompt_template(self, intent: ChatIntent) -> str:
-        """Obtener template de prompt específico según intención."""
-        
-        if intent == ChatIntent.PATIENT_INFO:
-            return """
-Eres un asistente médico. Responde la consulta sobre el paciente basándote ÚNICAMENTE en la información médica proporcionada.
-
-INFORMACIÓN MÉDICA DISPONIBLE:
-{context}
-
-PREGUNTA DEL USUARIO: {query}
-
-INSTRUCCIONES:
-1. Analiza la información médica disponible
-2. Responde de manera clara y directa a la pregunta
-3. Incluye detalles relevantes como diagnóstico, síntomas y fecha si están disponibles
-4. Si la información es incompleta, menciona qué falta
-5. NUNCA inventes información que no esté en el contexto
-6. Usa un lenguaje médico profesional pero comprensible
-
-Formato de respuesta esperado:
-- Respuesta directa a la pregunta
-- Detalles médicos relevantes
-- Recomendación de consultar al médico si es necesario
-
-RESPUESTA:
-"""
+    async def _generate_answer_stream(self, analysis: QueryAnalysis, context: str) -> AsyncIterator[str]:
+        """
+        Generar respuesta usando GPT-4 en streaming.
         
-        elif intent == ChatIntent.CONDITION_LIST:
-            return """
-Basándote en la información médica proporcionada, genera una lista de pacientes que cumplen con el criterio solicitado.
-
-INFORMACIÓN MÉDICA DISPONIBLE:
-{context}
-
-CONSULTA: {query}
-
-INSTRUCCIONES:
-- Lista SOLO pacientes que aparezcan en la información proporcionada
-- Incluye información relevante de cada paciente (diagnóstico, fecha, síntomas)
-- Organiza la lista de manera clara y estructurada
-- Indica el número total de pacientes encontrados
-- Si no hay pacientes que cumplan el criterio, indícalo claramente
-
-RESPUESTA:
-"""
+        El texto concatenado es idéntico a _validate_response sobre la respuesta
+        completa: durante el stream solo se emite el prefijo que ya es definitivo
+        (sin espacios finales y dentro del límite de longitud), y el último
+        chunk sale de _validate_response, que agrega el disclaimer antes de truncar.
+        """
+        text = ""
+        emitted_chars = 0
         
-        else:
-            return """
-Basándote en la información médica proporcionada, responde la consulta médica de manera precisa y responsable.
-
-INFORMACIÓN MÉDICA DISPONIBLE:
-{context}
-
-CONSULTA: {query}
-ENTIDADES DETECTADAS: {entities}
-
-INSTRUCCIONES:
-- Responde basándote ÚNICAMENTE en la información proporcionada
-- Mantén un enfoque médico profesional pero accesible
-- Si la información es insuficiente, sugiere consultar al médico
-- NUNCA inventes datos médicos
-- Proporciona respuestas estructuradas y claras
-
-RESPUESTA:
-"""
+        try:
+            messages = self._build_answer_messages(analysis, context)
+            
+            async for fragment in self.openai_service._stream_openai_chat_api(messages):
+                text += fragment
+                body = text.strip()
+                
+                # Pasado el límite, el final ya es body[:límite] + "..." con o sin disclaimer
+                if len(body) > _MAX_ANSWER_CHARS:
+                    break
+                
+                if len(body) > emitted_chars:
+                    yield body[emitted_chars:]
+                    emitted_chars = len(body)
+            
+            final = self._validate_response(text, analysis)
+            if len(final) > emitted_chars:
+                yield final[emitted_chars:]
+                
+        except Exception as e:
+            logger.error("Streaming answer generation failed", error=str(e))
+            if not emitted_chars:
+                yield _ANSWER_FALLBACK_MESSAGE
+    
+    def _get_prompt_template(self, intent: ChatIntent) -> Template:
+        """Obtener template de prompt precompilado según intención."""
+        return self._prompt_templates.get(intent, self._default_prompt_template)
     
     def _validate_response(self, response: str, analysis: QueryAnalysis) -> str:
         """Validar y limpiar respuesta generada."""
@@ -609,14 +1058,12 @@ RESPUESTA:
             cleaned = response.strip()
             
             # Agregar disclaimer médico si es necesario
-            medical_keywords = ["diagnóstico", "medicamento", "tratamiento", "enfermedad"]
-            if any(keyword in cleaned.lower() for keyword in medical_keywords):
-                disclaimer = "\n\n⚠️ Esta información proviene de conversaciones registradas. Para decisiones médicas, consulte siempre con un profesional de la salud."
-                cleaned += disclaimer
+            if any(keyword in cleaned.lower() for keyword in _MEDICAL_KEYWORDS):
+                cleaned += _MEDICAL_DISCLAIMER
             
             # Limitar longitud
-            if len(cleaned) > 2000:
-                cleaned = cleaned[:2000] + "..."
+            if len(cleaned) > _MAX_ANSWER_CHARS:
+                cleaned = cleaned[:_MAX_ANSWER_CHARS] + "..."
             
             return cleaned
             
@@ -624,21 +1071,21 @@ RESPUESTA:
             logger.warning("Response validation failed", error=str(e))
             return response
     
-    def _prepare_sources(self, contexts: List[Dict[str, Any]]) -> List[ChatSource]:
+    def _prepare_sources(self, contexts: List[ContextRow]) -> List[ChatSource]:
         """Preparar fuentes para la respuesta."""
         sources = []
         
         for context in contexts[:5]:  # Top 5 fuentes
             source = ChatSource(
-                conversation_id=context.get("conversation_id", "unknown"),
-                patient_name=context.get("patient_name"),
-                relevance_score=context.get("final_score", context.get("similarity_score", 0.0)),
-                excerpt=context.get("excerpt", context.get("content", "")[:200]),
-                date=context.get("date"),
+                conversation_id=context.conversation_id,
+                patient_name=context.patient_name,
+                relevance_score=context.score,
+                excerpt=context.excerpt,
+                date=context.date,
                 metadata={
-                    "diagnosis": context.get("diagnosis"),
-                    "symptoms": context.get("symptoms"),
-                    "rank": context.get("rank", 0)
+                    "diagnosis": context.diagnosis,
+                    "symptoms": context.symptoms,
+                    "rank": context.rank
                 }
             )
             sources.append(source)
@@ -647,7 +1094,7 @@ RESPUESTA:
     
     def _calculate_confidence(
         self, 
-        contexts: List[Dict[str, Any]], 
+        contexts: List[ContextRow], 
         analysis: QueryAnalysis
     ) -> float:
         """Calcular nivel de confianza de la respuesta."""
@@ -655,7 +1102,7 @@ RESPUESTA:
             return 0.1
         
         # Factores de confianza
-        avg_similarity = sum(c.get("final_score", 0) for c in contexts[:3]) / min(len(contexts), 3)
+        avg_similarity = sum(c.final_score or 0 for c in contexts[:3]) / min(len(contexts), 3)
         
         # Bonus por coincidencia de entidades
         entity_bonus = 0.0
@@ -703,18 +1150,14 @@ RESPUESTA:
         return suggestions[:3]  # Máximo 3 sugerencias
 
 
-# Singleton service instance
-_chat_service_instance: Optional[ChatService] = None
-
-
+@functools.cache
 def get_chat_service() -> ChatService:
-    """Obtener instancia singleton del servicio de chat."""
-    global _chat_service_instance
-    
-    if _chat_service_instance is None:
-        _chat_service_instance = ChatService()
+    """
+    Obtener instancia singleton del servicio de chat.
     
-    return _chat_service_instance
+    Usar get_chat_service.cache_clear() para descartar la instancia (tests).
+    """
+    return ChatService()
 
 
 async def process_medical_query(
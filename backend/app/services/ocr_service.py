@@ -9,9 +9,12 @@ PLUS Feature 4: Subida de PDFs/Imágenes con OCR
 
 import os
 import io
+import asyncio
 import time
 import json
+import hashlib
 import mimetypes
+from collections import OrderedDict
 from pathlib import Path
 from typing import Dict, Any, Optional, Tuple, List
 import structlog
@@ -38,6 +41,17 @@ logger = structlog.get_logger(__name__)
 settings = get_settings()
 
 
+# Documentos procesados en paralelo por cada lote de process_documents
+DOCUMENT_BATCH_SIZE = 16
+
+# Versión del prompt de metadata; forma parte de la clave de caché, así que
+# cambiarla invalida las respuestas cacheadas con el prompt anterior
+METADATA_PROMPT_VERSION = "v1"
+
+# Caracteres del documento que se envían a OpenAI para extraer metadata
+METADATA_TEXT_LIMIT = 4000
+
+
 class OCRServiceError(Exception):
     """Excepción personalizada para errores del servicio OCR."""
     pass
@@ -58,6 +72,9 @@ class OCRService:
         """Inicializar el servicio OCR."""
         self.openai_service: OpenAIService = get_openai_service()
         
+        # Caché de metadata por hash del texto: clave -> (metadata, instante de guardado)
+        self._metadata_cache: "OrderedDict[str, Tuple[DocumentMetadata, float]]" = OrderedDict()
+        
         # Verificar dependencias
         self._check_dependencies()
         
@@ -126,7 +143,8 @@ class OCRService:
     async def process_document(
         self, 
         file_path: str, 
-        original_filename: str
+        original_filename: str,
+        file_bytes: Optional[bytes] = None
     ) -> Tuple[OCRResult, Optional[DocumentMetadata]]:
         """
         Procesar documento completo: extracción de texto + metadata médica.
@@ -134,6 +152,8 @@ class OCRService:
         Args:
             file_path: Ruta al archivo local
             original_filename: Nombre original del archivo
+            file_bytes: Contenido del archivo ya en memoria (opcional); si se
+                proporciona no se lee file_path del disco
             
         Returns:
             Tupla con resultado OCR y metadata extraída
@@ -153,9 +173,9 @@ class OCRService:
             
             # Extraer texto según tipo
             if file_type == "pdf":
-                ocr_result = await self._process_pdf(file_path)
+                ocr_result = await self._process_pdf(file_path, file_bytes)
             elif file_type == "image":
-                ocr_result = await self._process_image(file_path)
+                ocr_result = await self._process_image(file_path, file_bytes)
             else:
                 raise OCRServiceError(f"Tipo de archivo no soportado: {file_type}")
             
@@ -185,12 +205,55 @@ class OCRService:
                         processing_time_ms=processing_time)
             raise OCRServiceError(f"Error procesando documento: {str(e)}")
     
-    async def _process_pdf(self, file_path: str) -> OCRResult:
+    async def process_documents(
+        self,
+        documents: List[Tuple[str, str]],
+        file_contents: Optional[List[bytes]] = None,
+        batch_size: int = DOCUMENT_BATCH_SIZE
+    ) -> List[Tuple[OCRResult, Optional[DocumentMetadata]]]:
+        """
+        Procesar varios documentos en lotes concurrentes.
+        
+        Args:
+            documents: Lista de tuplas (ruta del archivo, nombre original)
+            file_contents: Contenidos ya en memoria, alineados con documents (opcional)
+            batch_size: Máximo de documentos procesados a la vez
+            
+        Returns:
+            Resultados de process_document en el mismo orden que documents
+            
+        Raises:
+            OCRServiceError: Si el procesamiento de algún documento falla
+        """
+        if file_contents is not None and len(file_contents) != len(documents):
+            raise OCRServiceError("file_contents debe tener un elemento por documento")
+        
+        results: List[Tuple[OCRResult, Optional[DocumentMetadata]]] = []
+        
+        for start in range(0, len(documents), batch_size):
+            batch = documents[start:start + batch_size]
+            results.extend(await asyncio.gather(*[
+                self.process_document(
+                    file_path,
+                    original_filename,
+                    file_contents[start + offset] if file_contents is not None else None
+                )
+                for offset, (file_path, original_filename) in enumerate(batch)
+            ]))
+        
+        logger.info("Document batch processing completed",
+                   document_count=len(documents),
+                   batch_size=batch_size)
+        
+        return results
+    
+    async def _process_pdf(self, file_path: str, file_bytes: Optional[bytes] = None) -> OCRResult:
         """
         Procesar archivo PDF para extraer texto.
         
         Args:
             file_path: Ruta al archivo PDF
+            file_bytes: Contenido del PDF en memoria (opcional)
             
         Returns:
             Resultado con texto extraído
@@ -204,7 +267,8 @@ class OCRService:
             extracted_text = ""
             page_count = 0
             
-            with open(file_path, 'rb') as pdf_file:
+            pdf_source = io.BytesIO(file_bytes) if file_bytes is not None else open(file_path, 'rb')
+            with pdf_source as pdf_file:
                 pdf_reader = PyPDF2.PdfReader(pdf_file)
                 page_count = len(pdf_reader.pages)
                 
@@ -243,12 +307,13 @@ class OCRService:
             logger.error("PDF processing failed", file_path=file_path, error=str(e))
             raise OCRServiceError(f"Error procesando PDF: {str(e)}")
     
-    async def _process_image(self, file_path: str) -> OCRResult:
+    async def _process_image(self, file_path: str, file_bytes: Optional[bytes] = None) -> OCRResult:
         """
         Procesar imagen con OCR para extraer texto.
         
         Args:
             file_path: Ruta al archivo de imagen
+            file_bytes: Contenido de la imagen en memoria (opcional)
             
         Returns:
             Resultado con texto extraído y confianza
@@ -260,7 +325,8 @@ class OCRService:
             logger.debug("Processing image with OCR", file_path=file_path)
             
             # Abrir imagen
-            with Image.open(file_path) as image:
+            image_source = io.BytesIO(file_bytes) if file_bytes is not None else file_path
+            with Image.open(image_source) as image:
                 # Configurar parámetros de OCR
                 custom_config = f'--oem 3 --psm 6 -l {settings.OCR_LANGUAGE}'
                 
@@ -343,16 +409,52 @@ class OCRService:
             logger.warning("Text cleaning failed", error=str(e))
             return text  # Retornar texto original si falla limpieza
     
+    @staticmethod
+    def _metadata_cache_key(text: str) -> str:
+        """Clave de caché: SHA-256 de la versión del prompt y el texto enviado."""
+        payload = f"{METADATA_PROMPT_VERSION}\0{text[:METADATA_TEXT_LIMIT]}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _get_cached_metadata(self, cache_key: str) -> Optional[DocumentMetadata]:
+        """Obtener metadata cacheada si existe y no expiró."""
+        entry = self._metadata_cache.get(cache_key)
+        if entry is None:
+            return None
+        
+        metadata, stored_at = entry
+        if time.monotonic() - stored_at > settings.OCR_METADATA_CACHE_TTL:
+            del self._metadata_cache[cache_key]
+            return None
+        
+        self._metadata_cache.move_to_end(cache_key)
+        return metadata.model_copy(deep=True)
+    
+    def _store_cached_metadata(self, cache_key: str, metadata: DocumentMetadata) -> None:
+        """Guardar metadata en caché, descartando la entrada menos usada si se llena."""
+        self._metadata_cache[cache_key] = (metadata.model_copy(deep=True), time.monotonic())
+        self._metadata_cache.move_to_end(cache_key)
+        while len(self._metadata_cache) > settings.OCR_METADATA_CACHE_MAX_SIZE:
+            self._metadata_cache.popitem(last=False)
+    
     async def _extract_medical_metadata(self, text: str) -> DocumentMetadata:
         """
         Extraer metadata médica usando IA.
         
+        Los resultados se cachean por hash del texto, así que un documento
+        re-subido con el mismo contenido no vuelve a llamar a OpenAI.
+        
         Args:
             text: Texto del documento
             
         Returns:
             Metadata médica extraída
         """
+        cache_key = self._metadata_cache_key(text)
+        cached_metadata = self._get_cached_metadata(cache_key)
+        if cached_metadata is not None:
+            logger.debug("Medical metadata cache hit", text_length=len(text))
+            return cached_metadata
+        
         try:
             logger.debug("Extracting medical metadata", text_length=len(text))
             
@@ -361,7 +463,7 @@ class OCRService:
 Analiza este documento médico en español y extrae la siguiente información:
 
 DOCUMENTO:
-{text[:4000]}  # Limitar para evitar tokens excesivos
+{text[:METADATA_TEXT_LIMIT]}  # Limitar para evitar tokens excesivos
 
 INSTRUCCIONES:
 Extrae ÚNICAMENTE la información que esté explícitamente mencionada en el documento.
@@ -411,6 +513,9 @@ Responde ÚNICAMENTE con el JSON válido, sin explicaciones adicionales.
                            document_type=metadata.document_type,
                            conditions_count=len(metadata.medical_conditions))
                 
+                # Solo se cachean extracciones exitosas; los errores se reintentan
+                self._store_cached_metadata(cache_key, metadata)
+                
                 return metadata
                 
             except json.JSONDecodeError as e:
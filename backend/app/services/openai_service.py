@@ -8,7 +8,7 @@ de texto transcrito usando los modelos GPT de OpenAI.
 import os
 import json
 import asyncio
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Optional, Tuple, AsyncIterator
 import structlog
 from openai import AzureOpenAI
 from openai.types.chat import ChatCompletion
@@ -248,6 +248,49 @@ class OpenAIService:
             )
             raise OpenAIExtractionError(f"Chat API call failed: {str(e)}")
     
+    async def _stream_openai_chat_api(self, messages: list) -> AsyncIterator[str]:
+        """
+        Make streaming API call to OpenAI for chat responses (text format).
+        Yields content deltas as soon as they are received.
+        
+        Args:
+            messages: List of message dictionaries
+            
+        Yields:
+            Response content fragments from OpenAI
+        """
+        try:
+            loop = asyncio.get_event_loop()
+            
+            stream = await loop.run_in_executor(
+                None,
+                lambda: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=2000,  # Más tokens para respuestas de chat
+                    temperature=0.3,  # Ligeramente más creativo para chat
+                    stream=True
+                )
+            )
+            
+            # El cliente es síncrono: leer cada chunk en el thread pool
+            chunks = iter(stream)
+            end_of_stream = object()
+            while True:
+                chunk = await loop.run_in_executor(None, next, chunks, end_of_stream)
+                if chunk is end_of_stream:
+                    break
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            
+        except Exception as e:
+            logger.error(
+                "OpenAI Chat streaming call failed",
+                error=str(e),
+                model=self.model
+            )
+            raise OpenAIExtractionError(f"Chat streaming call failed: {str(e)}")
+    
     def _get_structured_extraction_prompt(self) -> str:
         """Get system prompt for structured data extraction."""
         return """
@@ -0,0 +1,170 @@
+"""
+Extracción de características de audio por tramas para speaker diarization.
+
+Calcula energía RMS, zero crossing rate y centroide espectral sobre un único
+framing de la señal, en lugar de una llamada de librosa (con su propio
+framing y padding) por característica.
+
+PLUS Feature 5: Diferenciación de Hablantes
+"""
+
+import functools
+from typing import Callable, Tuple
+
+import numpy as np
+
+# numba llega como dependencia de librosa; sin él se usa la versión numpy
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
+# Mismos valores por defecto que librosa.feature
+DEFAULT_FRAME_LENGTH = 2048
+DEFAULT_HOP_LENGTH = 512
+
+
+def frame_signal(y: np.ndarray, frame_length: int, hop_length: int) -> np.ndarray:
+    """
+    Dividir la señal en tramas centradas (padding con ceros, como center=True en librosa).
+    
+    Args:
+        y: Señal mono
+        frame_length: Muestras por trama
+        hop_length: Salto entre tramas
+    
+    Returns:
+        Vista (n_tramas, frame_length) sobre la señal con padding
+    """
+    pad = frame_length // 2
+    padded = np.pad(y, pad)
+    return np.lib.stride_tricks.sliding_window_view(padded, frame_length)[::hop_length]
+
+
+def _rms_zcr_numpy(frames: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """RMS y zero crossing rate por trama con operaciones vectorizadas."""
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    negative = frames < 0
+    zcr = np.count_nonzero(negative[:, 1:] != negative[:, :-1], axis=1) / frames.shape[1]
+    return rms, zcr
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True)
+    def _rms_zcr_kernel(frames):
+        """RMS y zero crossing rate en una sola pasada por trama, tramas en paralelo."""
+        n_frames, frame_length = frames.shape
+        rms = np.empty(n_frames)
+        zcr = np.empty(n_frames)
+        
+        for i in prange(n_frames):
+            prev = frames[i, 0]
+            energy = 0.0  # Acumulador float64 aunque las muestras sean float32
+            energy += prev * prev
+            crossings = 0
+            for j in range(1, frame_length):
+                x = frames[i, j]
+                energy += x * x
+                if (x < 0.0) != (prev < 0.0):
+                    crossings += 1
+                prev = x
+            rms[i] = np.sqrt(energy / frame_length)
+            zcr[i] = crossings / frame_length
+        
+        return rms, zcr
+else:
+    _rms_zcr_kernel = _rms_zcr_numpy
+
+
+def _hann_window(frame_length: int) -> np.ndarray:
+    """Ventana Hann periódica, como la que usa librosa."""
+    return 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(frame_length) / frame_length)
+
+
+def _centroid_from_spectrum(frames: np.ndarray, window: np.ndarray, freqs: np.ndarray) -> np.ndarray:
+    """Centroide espectral por trama con ventana y frecuencias ya calculadas."""
+    spectrum = np.abs(np.fft.rfft(frames * window, axis=1))
+    total = spectrum.sum(axis=1)
+    return np.divide(spectrum @ freqs, total, out=np.zeros_like(total), where=total > 0)
+
+
+def _spectral_centroid(frames: np.ndarray, sr: int) -> np.ndarray:
+    """Centroide espectral por trama (ventana Hann periódica, como librosa)."""
+    frame_length = frames.shape[1]
+    freqs = np.fft.rfftfreq(frame_length, d=1.0 / sr)
+    return _centroid_from_spectrum(frames, _hann_window(frame_length), freqs)
+
+
+def extract_frame_features(
+    y: np.ndarray,
+    sr: int,
+    frame_length: int = DEFAULT_FRAME_LENGTH,
+    hop_length: int = DEFAULT_HOP_LENGTH
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calcular RMS, zero crossing rate y centroide espectral por trama.
+    
+    Args:
+        y: Señal mono
+        sr: Sample rate
+        frame_length: Muestras por trama
+        hop_length: Salto entre tramas
+    
+    Returns:
+        Tupla (rms, zcr, centroide) con un valor por trama
+    """
+    frames = frame_signal(y, frame_length, hop_length)
+    rms, zcr = _rms_zcr_kernel(frames)
+    centroid = _spectral_centroid(frames, sr)
+    return rms, zcr, centroid
+
+
+def make_extractor(
+    sr: int,
+    n_fft: int,
+    hop: int
+) -> Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Crear un extractor especializado para una configuración fija.
+    
+    La ventana Hann y el eje de frecuencias se calculan una sola vez, y el
+    kernel de RMS/ZCR se compila al crear el extractor en lugar de en la
+    primera llamada.
+    
+    Args:
+        sr: Sample rate esperado
+        n_fft: Muestras por trama
+        hop: Salto entre tramas
+    
+    Returns:
+        Función y -> (rms, zcr, centroide); expone sample_rate, n_fft y
+        hop_length como atributos
+    """
+    window = _hann_window(n_fft)
+    freqs = np.fft.rfftfreq(n_fft, d=1.0 / sr)
+    
+    def extract(y: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        frames = frame_signal(y, n_fft, hop)
+        rms, zcr = _rms_zcr_kernel(frames)
+        return rms, zcr, _centroid_from_spectrum(frames, window, freqs)
+    
+    if njit is not None:
+        # Compilación anticipada para las señales float32 con las que trabaja el servicio
+        _rms_zcr_kernel(frame_signal(np.zeros(n_fft, dtype=np.float32), n_fft, hop))
+    
+    extract.sample_rate = sr
+    extract.n_fft = n_fft
+    extract.hop_length = hop
+    return extract
+
+
+@functools.cache
+def get_default_extractor() -> Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Extractor de voz a 16 kHz: tramas de 32 ms con salto de 10 ms.
+    
+    Se construye en el primer uso y no al importar el módulo, para no pagar la
+    compilación del kernel en procesos que nunca diarizan.
+    """
+    return make_extractor(sr=16000, n_fft=512, hop=160)
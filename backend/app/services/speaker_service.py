@@ -7,22 +7,29 @@ hablantes en conversaciones médicas (promotor vs paciente).
 PLUS Feature 5: Diferenciación de Hablantes
 """
 
+import os
 import re
 import time
+import asyncio
+import hashlib
+import tempfile
 import numpy as np
-from typing import List, Dict, Any, Tuple, Optional
+from collections import Counter
+from pathlib import Path
+from typing import Callable, List, Dict, Any, Tuple, Optional, Union
 import structlog
 
 # Audio processing libraries
 try:
     import librosa
     import scipy.signal
-    from sklearn.cluster import KMeans
+    from sklearn.cluster import KMeans, MiniBatchKMeans
     from sklearn.preprocessing import StandardScaler
 except ImportError:
     librosa = None
     scipy = None
     KMeans = None
+    MiniBatchKMeans = None
     StandardScaler = None
 
 from app.core.config import get_settings
@@ -30,16 +37,55 @@ from app.core.schemas import (
     SpeakerSegment, SpeakerStats, DiarizationResult, 
     SpeakerType, TranscriptionResponse
 )
+from app.services.speaker_features import extract_frame_features, get_default_extractor
 
 logger = structlog.get_logger(__name__)
 settings = get_settings()
 
+# Audio de entrada: ruta en disco o muestras ya cargadas (forma de onda, sample rate)
+AudioSource = Union[str, Tuple[np.ndarray, int]]
+
+# A partir de cuántos segmentos se agrupa con MiniBatchKMeans en lugar de KMeans completo
+_MINIBATCH_MIN_SEGMENTS = 1000
+
+# Energía RMS por debajo de la cual un segmento se considera silencio
+_SILENCE_RMS_THRESHOLD = 1e-4
+
+# Versión de la extracción de características; cambiarla invalida la caché en disco
+FEATURE_CACHE_VERSION = "v2"
+
+# Índice numérico de cada tipo de hablante para las estadísticas vectorizadas
+_SPEAKER_INDEX = {speaker: i for i, speaker in enumerate(SpeakerType)}
+
 
 class SpeakerDiarizationError(Exception):
     """Excepción personalizada para errores de diarización."""
     pass
 
 
+def batch_audio_files(
+    waveforms: List[np.ndarray],
+    dtype: np.dtype = np.float32
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Apilar formas de onda de distinta duración en un único arreglo con padding.
+    
+    Args:
+        waveforms: Formas de onda mono
+        dtype: Tipo de dato del arreglo resultante
+        
+    Returns:
+        Tupla (padded, lengths): arreglo (n, T_max) relleno con ceros y la
+        longitud real de cada forma de onda
+    """
+    lengths = np.fromiter((len(w) for w in waveforms), dtype=np.int64, count=len(waveforms))
+    padded = np.zeros((len(waveforms), int(lengths.max(initial=0))), dtype=dtype)
+    for i, waveform in enumerate(waveforms):
+        padded[i, :lengths[i]] = waveform
+    
+    return padded, lengths
+
+
 class SpeakerService:
     """
     Servicio para diferenciación de hablantes en conversaciones médicas.
@@ -50,9 +96,25 @@ class SpeakerService:
     - Patrones típicos de conversaciones médicas
     """
     
-    def __init__(self):
-        """Inicializar el servicio de speaker diarization."""
+    def __init__(
+        self,
+        feature_dtype: np.dtype = np.float32,
+        extractor: Optional[Callable[[np.ndarray], Tuple[np.ndarray, ...]]] = None
+    ):
+        """
+        Inicializar el servicio de speaker diarization.
+        
+        Args:
+            feature_dtype: Precisión de las muestras y características de audio;
+                float32 evita el upcast a float64 y reduce a la mitad el ancho de banda
+            extractor: Extractor RMS/ZCR/centroide especializado (ver
+                speaker_features.make_extractor); se usa cuando el audio tiene
+                su sample rate y el resto cae al extractor genérico. Por
+                defecto, el de voz a 16 kHz
+        """
         self._check_dependencies()
+        self._feature_dtype = np.dtype(feature_dtype)
+        self._extract = extractor if extractor is not None else get_default_extractor()
         
         # Patrones para identificar rol de hablante
         self._promotor_patterns = [
@@ -74,6 +136,10 @@ class SpeakerService:
             r"mi familia|mi trabajo|en casa"
         ]
         
+        # Patrones precompilados una sola vez; el score cuenta cada patrón por separado
+        self._compiled_promotor_patterns = [re.compile(p) for p in self._promotor_patterns]
+        self._compiled_paciente_patterns = [re.compile(p) for p in self._paciente_patterns]
+        
         # Palabras clave médicas del promotor
         self._medical_professional_keywords = [
             "diagnóstico", "tratamiento", "medicamento", "receta", 
@@ -109,7 +175,8 @@ class SpeakerService:
         self,
         audio_file_path: str,
         transcription: str,
-        whisper_segments: Optional[List[Dict]] = None
+        whisper_segments: Optional[List[Dict]] = None,
+        cache: Optional[str] = "default"
     ) -> DiarizationResult:
         """
         Realizar diarización completa de una conversación.
@@ -118,26 +185,177 @@ class SpeakerService:
             audio_file_path: Ruta al archivo de audio
             transcription: Transcripción completa
             whisper_segments: Segmentos de Whisper con timestamps (opcional)
+            cache: Directorio de caché de características; "default" usa la
+                configuración y None la desactiva
+            
+        Returns:
+            Resultado completo de diarización con segmentos y estadísticas
+        """
+        return await self._diarize(audio_file_path, transcription, whisper_segments, cache)
+    
+    async def diarize_samples(
+        self,
+        samples: np.ndarray,
+        sr: int,
+        transcription: str,
+        whisper_segments: Optional[List[Dict]] = None,
+        cache: Optional[str] = "default"
+    ) -> DiarizationResult:
+        """
+        Realizar diarización sobre audio ya cargado en memoria.
+        
+        Evita el librosa.load del archivo: útil cuando el llamador ya tiene
+        la forma de onda decodificada.
+        
+        Args:
+            samples: Forma de onda mono
+            sr: Sample rate de las muestras
+            transcription: Transcripción completa
+            whisper_segments: Segmentos de Whisper con timestamps (opcional)
+            cache: Directorio de caché de características; "default" usa la
+                configuración y None la desactiva
+            
+        Returns:
+            Resultado completo de diarización con segmentos y estadísticas
+        """
+        return await self._diarize((samples, sr), transcription, whisper_segments, cache)
+    
+    async def diarize_conversation_batch(
+        self,
+        items: List[Tuple[AudioSource, str, Optional[List[Dict]]]],
+        return_exceptions: bool = False
+    ) -> List[Union[DiarizationResult, SpeakerDiarizationError]]:
+        """
+        Diarizar varias conversaciones en una sola llamada.
+        
+        Args:
+            items: Tuplas (audio, transcripción, segmentos de Whisper[, caché]);
+                el audio puede ser una ruta o una tupla (muestras, sample rate)
+            return_exceptions: Si es True, los errores se devuelven en la
+                posición de su conversación en lugar de propagarse
+        
+        Returns:
+            Resultados en el mismo orden que items
+        """
+        logger.info("Starting batch speaker diarization", batch_size=len(items))
+        
+        # Cada conversación en su propio hilo del thread pool: el lote no se serializa
+        results = await asyncio.gather(
+            *[
+                self._diarize(audio_source, transcription, whisper_segments, *options)
+                for audio_source, transcription, whisper_segments, *options in items
+            ],
+            return_exceptions=return_exceptions
+        )
+        
+        # return_exceptions solo captura errores de diarización; el resto se propaga
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, SpeakerDiarizationError):
+                raise result
+        
+        return results
+    
+    async def diarize_samples_batch(
+        self,
+        padded: np.ndarray,
+        lengths: np.ndarray,
+        sr: int,
+        transcriptions: List[str],
+        whisper_segments: Optional[List[Optional[List[Dict]]]] = None,
+        return_exceptions: bool = False
+    ) -> List[Union[DiarizationResult, SpeakerDiarizationError]]:
+        """
+        Diarizar un lote de formas de onda apiladas con batch_audio_files.
+        
+        Cada conversación se recorta a su longitud real (una vista, sin
+        copiar) antes de diarizarla, de modo que el padding no genera
+        segmentos de silencio.
+        
+        Args:
+            padded: Arreglo (n, T_max) con las formas de onda
+            lengths: Longitud real de cada forma de onda
+            sr: Sample rate común del lote
+            transcriptions: Transcripción de cada conversación
+            whisper_segments: Segmentos de Whisper por conversación (opcional)
+            return_exceptions: Ver diarize_conversation_batch
+            
+        Returns:
+            Resultados en el mismo orden que las filas de padded
+        """
+        if len(transcriptions) != len(padded):
+            raise SpeakerDiarizationError(
+                f"El lote tiene {len(padded)} audios y {len(transcriptions)} transcripciones"
+            )
+        
+        segments_per_item = whisper_segments or [None] * len(padded)
+        items = [
+            ((padded[i, :lengths[i]], sr), transcriptions[i], segments_per_item[i])
+            for i in range(len(padded))
+        ]
+        return await self.diarize_conversation_batch(items, return_exceptions)
+    
+    async def _diarize(
+        self,
+        audio_source: AudioSource,
+        transcription: str,
+        whisper_segments: Optional[List[Dict]],
+        cache: Optional[str] = "default"
+    ) -> DiarizationResult:
+        """
+        Flujo común de diarización para audio en disco o en memoria.
+        
+        La extracción de características y el clustering son CPU-bound: se
+        ejecutan en el thread pool para no bloquear el event loop.
+        
+        Args:
+            audio_source: Ruta al archivo de audio o tupla (muestras, sample rate)
+            transcription: Transcripción completa
+            whisper_segments: Segmentos de Whisper con timestamps (opcional)
+            cache: Directorio de caché de características (ver diarize_conversation)
+            
+        Returns:
+            Resultado completo de diarización con segmentos y estadísticas
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None, self._diarize_sync, audio_source, transcription, whisper_segments, cache
+        )
+    
+    def _diarize_sync(
+        self,
+        audio_source: AudioSource,
+        transcription: str,
+        whisper_segments: Optional[List[Dict]],
+        cache: Optional[str] = "default"
+    ) -> DiarizationResult:
+        """
+        Diarización síncrona de una conversación.
+        
+        Args:
+            audio_source: Ruta al archivo de audio o tupla (muestras, sample rate)
+            transcription: Transcripción completa
+            whisper_segments: Segmentos de Whisper con timestamps (opcional)
             
         Returns:
             Resultado completo de diarización con segmentos y estadísticas
         """
         start_time = time.time()
+        audio_label = audio_source if isinstance(audio_source, str) else "<memory>"
         
         try:
             logger.info("Starting speaker diarization",
-                       audio_file=audio_file_path,
+                       audio_file=audio_label,
                        transcription_length=len(transcription))
             
             # Estrategia híbrida de diarización
             if whisper_segments and librosa:
                 # Método avanzado: audio + texto
-                segments = await self._diarize_with_audio_and_text(
-                    audio_file_path, transcription, whisper_segments
+                segments = self._segments_with_audio_and_text(
+                    audio_source, transcription, whisper_segments, cache
                 )
             else:
                 # Método básico: solo texto
-                segments = await self._diarize_text_only(transcription)
+                segments = self._segments_text_only(transcription)
             
             # Calcular estadísticas
             stats = self._calculate_speaker_stats(segments)
@@ -153,10 +371,11 @@ class SpeakerService:
                 confidence_threshold=settings.SPEAKER_CONFIDENCE_THRESHOLD
             )
             
+            speaker_counts = Counter(s.speaker for s in result.iter_segments())
             logger.info("Speaker diarization completed",
                        segments_count=len(segments),
-                       promotor_segments=len([s for s in segments if s.speaker == SpeakerType.PROMOTOR]),
-                       paciente_segments=len([s for s in segments if s.speaker == SpeakerType.PACIENTE]),
+                       promotor_segments=speaker_counts[SpeakerType.PROMOTOR],
+                       paciente_segments=speaker_counts[SpeakerType.PACIENTE],
                        processing_time_ms=processing_time)
             
             return result
@@ -164,24 +383,26 @@ class SpeakerService:
         except Exception as e:
             processing_time = int((time.time() - start_time) * 1000)
             logger.error("Speaker diarization failed",
-                        audio_file=audio_file_path,
+                        audio_file=audio_label,
                         error=str(e),
                         processing_time_ms=processing_time)
             raise SpeakerDiarizationError(f"Error en diarización: {str(e)}")
     
-    async def _diarize_with_audio_and_text(
+    def _segments_with_audio_and_text(
         self,
-        audio_file_path: str,
+        audio_source: AudioSource,
         transcription: str,
-        whisper_segments: List[Dict]
+        whisper_segments: List[Dict],
+        cache: Optional[str] = "default"
     ) -> List[SpeakerSegment]:
         """
-        Diarización avanzada usando características de audio y análisis de texto.
+        Segmentación híbrida síncrona (audio + texto) con fallback a solo texto.
         
         Args:
-            audio_file_path: Ruta al archivo de audio
+            audio_source: Ruta al archivo de audio o tupla (muestras, sample rate)
             transcription: Transcripción completa
             whisper_segments: Segmentos de Whisper
+            cache: Directorio de caché de características (ver diarize_conversation)
             
         Returns:
             Lista de segmentos con hablantes identificados
@@ -189,26 +410,18 @@ class SpeakerService:
         try:
             logger.debug("Using advanced audio+text diarization")
             
-            # Cargar audio
-            audio, sr = librosa.load(audio_file_path, sr=settings.DIARIZATION_SAMPLE_RATE)
+            # Características de audio por segmento, reutilizadas de disco si el audio ya se procesó
+            cache_path = self._feature_cache_path(audio_source, whisper_segments, cache)
+            audio_features = self._load_cached_features(cache_path)
+            if audio_features is None:
+                audio_features = self._compute_audio_features(audio_source, whisper_segments)
+                self._store_cached_features(cache_path, audio_features)
             
-            # Extraer características de audio para cada segmento
-            audio_features = []
-            text_features = []
-            
-            for segment in whisper_segments:
-                start_sample = int(segment.get('start', 0) * sr)
-                end_sample = int(segment.get('end', 0) * sr)
-                
-                # Extraer características de audio
-                audio_segment = audio[start_sample:end_sample]
-                features = self._extract_audio_features(audio_segment, sr)
-                audio_features.append(features)
-                
-                # Analizar contenido textual
-                text = segment.get('text', '')
-                text_score = self._analyze_text_content(text)
-                text_features.append(text_score)
+            # Analizar contenido textual
+            text_features = [
+                self._analyze_text_content(segment.get('text', ''))
+                for segment in whisper_segments
+            ]
             
             # Clustering de características de audio
             speaker_clusters = self._cluster_speakers(audio_features)
@@ -241,11 +454,203 @@ class SpeakerService:
         except Exception as e:
             logger.error("Advanced diarization failed", error=str(e))
             # Fallback a método básico
-            return await self._diarize_text_only(transcription)
+            return self._segments_text_only(transcription)
+    
+    def _compute_audio_features(
+        self,
+        audio_source: AudioSource,
+        whisper_segments: List[Dict]
+    ) -> List[np.ndarray]:
+        """
+        Extraer el vector de características de audio de cada segmento.
+        
+        Args:
+            audio_source: Ruta al archivo de audio o tupla (muestras, sample rate)
+            whisper_segments: Segmentos de Whisper
+            
+        Returns:
+            Lista de vectores de características, uno por segmento
+        """
+        audio_features = []
+        
+        # El audio se carga por ventanas acotadas: la memoria no crece con la duración
+        for window_start, window_end, window_segments in self._group_segments_by_window(whisper_segments):
+            audio, sr = self._load_audio(
+                audio_source, offset=window_start, duration=window_end - window_start
+            )
+            
+            # Vistas de todos los segmentos de la ventana, recortadas una sola vez
+            # (timestamps globales → posición relativa a la ventana)
+            slices = [
+                audio[int((segment.get('start', 0) - window_start) * sr):
+                      int((segment.get('end', 0) - window_start) * sr)]
+                for segment in window_segments
+            ]
+            
+            for audio_segment in slices:
+                if self._is_silent(audio_segment):
+                    # Sin voz: no vale la pena extraer características
+                    audio_features.append(np.zeros(6, dtype=self._feature_dtype))
+                else:
+                    audio_features.append(self._extract_audio_features(audio_segment, sr))
+        
+        return audio_features
+    
+    def _feature_cache_path(
+        self,
+        audio_source: AudioSource,
+        whisper_segments: List[Dict],
+        cache: Optional[str]
+    ) -> Optional[Path]:
+        """
+        Ruta del archivo de caché de características para este audio.
+        
+        La clave es el SHA-256 del contenido del audio junto con los límites de
+        los segmentos, la precisión, los parámetros del extractor y la versión
+        de la extracción.
+        
+        Args:
+            audio_source: Ruta al archivo de audio o tupla (muestras, sample rate)
+            whisper_segments: Segmentos de Whisper
+            cache: Directorio de caché; "default" usa la configuración y None la desactiva
+            
+        Returns:
+            Ruta del archivo .npz, o None si la caché está desactivada
+        """
+        if cache is None:
+            return None
+        if cache == "default":
+            if not settings.SPEAKER_FEATURE_CACHE_ENABLED:
+                return None
+            cache = settings.SPEAKER_FEATURE_CACHE_DIR
+        
+        digest = hashlib.sha256()
+        if isinstance(audio_source, tuple):
+            samples, sr = audio_source
+            digest.update(np.ascontiguousarray(samples).tobytes())
+        else:
+            sr = settings.DIARIZATION_SAMPLE_RATE
+            with open(audio_source, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+        
+        boundaries = ",".join(
+            f"{segment.get('start', 0)}-{segment.get('end', 0)}" for segment in whisper_segments
+        )
+        extractor = (self._extract.sample_rate, self._extract.n_fft, self._extract.hop_length)
+        digest.update(
+            f"\0{FEATURE_CACHE_VERSION}\0{sr}\0{self._feature_dtype.str}\0{extractor}\0{boundaries}".encode("utf-8")
+        )
+        
+        return Path(cache).expanduser() / f"{digest.hexdigest()}.npz"
+    
+    def _load_cached_features(self, cache_path: Optional[Path]) -> Optional[List[np.ndarray]]:
+        """Leer características cacheadas en disco, si existen."""
+        if cache_path is None or not cache_path.exists():
+            return None
+        
+        try:
+            with np.load(cache_path) as data:
+                features = data["features"]
+            logger.debug("Speaker feature cache hit", cache_file=str(cache_path))
+            return list(features)
+        except Exception as e:
+            logger.warning("Speaker feature cache read failed", cache_file=str(cache_path), error=str(e))
+            return None
     
-    async def _diarize_text_only(self, transcription: str) -> List[SpeakerSegment]:
+    def _store_cached_features(self, cache_path: Optional[Path], audio_features: List[np.ndarray]) -> None:
+        """Guardar características en disco; un fallo de escritura no interrumpe la diarización."""
+        if cache_path is None or not audio_features:
+            return
+        
+        tmp_path = None
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # Temporal único por escritor: dos diarizaciones del mismo audio no se pisan
+            with tempfile.NamedTemporaryFile(
+                dir=cache_path.parent, suffix=".tmp", delete=False
+            ) as f:
+                tmp_path = f.name
+                np.savez_compressed(f, features=np.stack(audio_features))
+            # Reemplazo atómico: nunca se lee un archivo a medio escribir
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            logger.warning("Speaker feature cache write failed", cache_file=str(cache_path), error=str(e))
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+    
+    def _group_segments_by_window(
+        self,
+        whisper_segments: List[Dict]
+    ) -> List[Tuple[float, float, List[Dict]]]:
         """
-        Diarización básica usando solo análisis de texto.
+        Agrupar segmentos consecutivos en ventanas de audio acotadas.
+        
+        Cada ventana abarca a lo sumo SPEAKER_AUDIO_WINDOW_SECONDS, salvo que un
+        único segmento sea más largo.
+        
+        Args:
+            whisper_segments: Segmentos de Whisper
+            
+        Returns:
+            Lista de tuplas (inicio, fin, segmentos) en segundos globales
+        """
+        window_seconds = settings.SPEAKER_AUDIO_WINDOW_SECONDS
+        windows = []
+        current: List[Dict] = []
+        window_start = window_end = 0.0
+        
+        for segment in whisper_segments:
+            start = float(segment.get('start', 0))
+            end = float(segment.get('end', 0))
+            
+            if current and max(end, window_end) - min(start, window_start) > window_seconds:
+                windows.append((window_start, window_end, current))
+                current = []
+            
+            if current:
+                window_start = min(window_start, start)
+                window_end = max(window_end, end)
+            else:
+                window_start, window_end = start, end
+            current.append(segment)
+        
+        if current:
+            windows.append((window_start, window_end, current))
+        
+        return windows
+    
+    def _load_audio(
+        self,
+        audio_source: AudioSource,
+        offset: float = 0.0,
+        duration: Optional[float] = None
+    ) -> Tuple[np.ndarray, int]:
+        """
+        Obtener forma de onda y sample rate de la fuente de audio.
+        
+        Args:
+            audio_source: Ruta al archivo de audio o tupla (muestras, sample rate)
+            offset: Inicio de la ventana en segundos
+            duration: Duración de la ventana en segundos (None = hasta el final)
+            
+        Returns:
+            Tupla (muestras, sample rate)
+        """
+        if isinstance(audio_source, tuple):
+            samples, sr = audio_source
+            start_sample = int(offset * sr)
+            end_sample = None if duration is None else start_sample + int(duration * sr)
+            # Solo la ventana se convierte a la precisión de trabajo
+            return samples[start_sample:end_sample].astype(self._feature_dtype, copy=False), sr
+        return librosa.load(
+            audio_source, sr=settings.DIARIZATION_SAMPLE_RATE,
+            offset=offset, duration=duration, dtype=self._feature_dtype
+        )
+    
+    def _segments_text_only(self, transcription: str) -> List[SpeakerSegment]:
+        """
+        Segmentación síncrona usando solo análisis de texto.
         
         Args:
             transcription: Transcripción completa
@@ -297,6 +702,13 @@ class SpeakerService:
                 word_count=len(transcription.split())
             )]
     
+    def _is_silent(self, audio_segment: np.ndarray) -> bool:
+        """Determinar si un segmento no tiene energía suficiente para contener voz."""
+        if audio_segment.size == 0:
+            return False
+        rms = np.sqrt(np.mean(np.square(audio_segment, dtype=np.float64)))
+        return rms < _SILENCE_RMS_THRESHOLD
+    
     def _extract_audio_features(self, audio_segment: np.ndarray, sr: int) -> np.ndarray:
         """
         Extraer características de audio relevantes para identificar hablantes.
@@ -310,7 +722,7 @@ class SpeakerService:
         """
         try:
             if len(audio_segment) < sr * 0.1:  # Menos de 100ms
-                return np.zeros(6)  # Retornar características vacías
+                return np.zeros(6, dtype=self._feature_dtype)  # Retornar características vacías
             
             # Características fundamentales para diferenciación de hablantes
             
@@ -319,16 +731,14 @@ class SpeakerService:
             pitch_mean = np.nanmean(f0)
             pitch_std = np.nanstd(f0)
             
-            # 2. Intensidad (RMS energy)
-            rms = librosa.feature.rms(y=audio_segment)[0]
+            # 2-4. Intensidad (RMS), espectro (centroide) y velocidad de habla (ZCR)
+            # sobre un único framing del segmento
+            if sr == self._extract.sample_rate:
+                rms, zcr, spectral_centroid = self._extract(audio_segment)
+            else:
+                rms, zcr, spectral_centroid = extract_frame_features(audio_segment, sr)
             energy_mean = np.mean(rms)
-            
-            # 3. Espectro (MFCC centroide)
-            spectral_centroid = librosa.feature.spectral_centroid(y=audio_segment, sr=sr)[0]
             spectrum_mean = np.mean(spectral_centroid)
-            
-            # 4. Velocidad de habla (zero crossing rate)
-            zcr = librosa.feature.zero_crossing_rate(audio_segment)[0]
             speech_rate = np.mean(zcr)
             
             # 5. Variabilidad tonal
@@ -341,13 +751,13 @@ class SpeakerService:
                 spectrum_mean,
                 speech_rate,
                 pitch_range
-            ])
+            ], dtype=self._feature_dtype)
             
             return features
             
         except Exception as e:
             logger.warning("Audio feature extraction failed", error=str(e))
-            return np.zeros(6)  # Características por defecto
+            return np.zeros(6, dtype=self._feature_dtype)  # Características por defecto
     
     def _cluster_speakers(self, audio_features: List[np.ndarray]) -> List[int]:
         """
@@ -364,7 +774,7 @@ class SpeakerService:
                 return [0] * len(audio_features)
             
             # Preparar datos para clustering
-            features_matrix = np.array(audio_features)
+            features_matrix = np.array(audio_features, dtype=self._feature_dtype)
             
             # Normalizar características
             if StandardScaler:
@@ -373,7 +783,11 @@ class SpeakerService:
             
             # K-means con 2 clusters (promotor y paciente)
             if KMeans:
-                kmeans = KMeans(n_clusters=2, random_state=42, n_init=10)
+                if MiniBatchKMeans and len(features_matrix) >= _MINIBATCH_MIN_SEGMENTS:
+                    # Conversaciones largas: actualizaciones por mini-lotes, memoria acotada
+                    kmeans = MiniBatchKMeans(n_clusters=2, random_state=42, batch_size=256, n_init=3)
+                else:
+                    kmeans = KMeans(n_clusters=2, random_state=42, n_init=10)
                 clusters = kmeans.fit_predict(features_matrix)
                 return clusters.tolist()
             else:
@@ -404,13 +818,13 @@ class SpeakerService:
         paciente_score = 0
         
         # Buscar patrones de promotor
-        for pattern in self._promotor_patterns:
-            if re.search(pattern, text_lower):
+        for pattern in self._compiled_promotor_patterns:
+            if pattern.search(text_lower):
                 promotor_score += 1
         
         # Buscar patrones de paciente
-        for pattern in self._paciente_patterns:
-            if re.search(pattern, text_lower):
+        for pattern in self._compiled_paciente_patterns:
+            if pattern.search(text_lower):
                 paciente_score += 1
         
         # Contar palabras clave médicas (típicas del promotor)
@@ -470,11 +884,12 @@ class SpeakerService:
             confidence = 0.4
         
         # Boost de confianza para patrones muy claros
-        if any(re.search(pattern, text.lower()) for pattern in self._promotor_patterns[:3]):
+        text_lower = text.lower()
+        if any(pattern.search(text_lower) for pattern in self._compiled_promotor_patterns[:3]):
             if speaker_type == SpeakerType.PROMOTOR:
                 confidence = min(0.95, confidence + 0.2)
         
-        if any(re.search(pattern, text.lower()) for pattern in self._paciente_patterns[:3]):
+        if any(pattern.search(text_lower) for pattern in self._compiled_paciente_patterns[:3]):
             if speaker_type == SpeakerType.PACIENTE:
                 confidence = min(0.95, confidence + 0.2)
         
@@ -571,42 +986,34 @@ class SpeakerService:
                 average_segment_length=0.0
             )
         
-        # Calcular tiempos por hablante
-        promotor_time = sum(
-            seg.end_time - seg.start_time 
-            for seg in segments 
-            if seg.speaker == SpeakerType.PROMOTOR
+        # Estructura de arreglos: un único recorrido de los objetos por campo
+        n_segments = len(segments)
+        ids = np.fromiter(
+            (_SPEAKER_INDEX[seg.speaker] for seg in segments), dtype=np.int8, count=n_segments
         )
+        starts = np.fromiter((seg.start_time for seg in segments), dtype=np.float64, count=n_segments)
+        ends = np.fromiter((seg.end_time for seg in segments), dtype=np.float64, count=n_segments)
+        durations = ends - starts
         
-        paciente_time = sum(
-            seg.end_time - seg.start_time 
-            for seg in segments 
-            if seg.speaker == SpeakerType.PACIENTE
-        )
-        
-        unknown_time = sum(
-            seg.end_time - seg.start_time 
-            for seg in segments 
-            if seg.speaker == SpeakerType.UNKNOWN
-        )
+        # Calcular tiempos y número de segmentos por hablante
+        time_per_speaker = np.bincount(ids, weights=durations, minlength=len(_SPEAKER_INDEX))
+        segments_per_speaker = np.bincount(ids, minlength=len(_SPEAKER_INDEX))
+        promotor_time = float(time_per_speaker[_SPEAKER_INDEX[SpeakerType.PROMOTOR]])
+        paciente_time = float(time_per_speaker[_SPEAKER_INDEX[SpeakerType.PACIENTE]])
+        unknown_time = float(time_per_speaker[_SPEAKER_INDEX[SpeakerType.UNKNOWN]])
         
         # Calcular tiempo total
-        total_duration = max(seg.end_time for seg in segments) if segments else 0.0
+        total_duration = float(ends.max())
         
         # Contar cambios de hablante
-        speaker_changes = 0
-        prev_speaker = None
-        for segment in segments:
-            if prev_speaker and prev_speaker != segment.speaker:
-                speaker_changes += 1
-            prev_speaker = segment.speaker
+        speaker_changes = int(np.count_nonzero(ids[1:] != ids[:-1]))
         
         # Duración promedio de segmentos
-        segment_durations = [seg.end_time - seg.start_time for seg in segments]
-        avg_segment_length = sum(segment_durations) / len(segment_durations) if segment_durations else 0.0
+        avg_segment_length = float(durations.mean())
         
         # Número de hablantes únicos
-        unique_speakers = len(set(seg.speaker for seg in segments if seg.speaker != SpeakerType.UNKNOWN))
+        segments_per_speaker[_SPEAKER_INDEX[SpeakerType.UNKNOWN]] = 0
+        unique_speakers = int(np.count_nonzero(segments_per_speaker))
         
         return SpeakerStats(
             total_speakers=unique_speakers,
@@ -638,7 +1045,8 @@ def get_speaker_service() -> SpeakerService:
 async def diarize_audio_conversation(
     audio_file_path: str,
     transcription: str,
-    whisper_segments: Optional[List[Dict]] = None
+    whisper_segments: Optional[List[Dict]] = None,
+    cache: Optional[str] = "default"
 ) -> DiarizationResult:
     """
     Función de conveniencia para diarizar una conversación.
@@ -647,11 +1055,13 @@ async def diarize_audio_conversation(
         audio_file_path: Ruta al archivo de audio
         transcription: Transcripción completa
         whisper_segments: Segmentos de Whisper (opcional)
+        cache: Directorio de caché de características; "default" usa la
+            configuración y None la desactiva
         
     Returns:
         Resultado completo de diarización
     """
     speaker_service = get_speaker_service()
     return await speaker_service.diarize_conversation(
-        audio_file_path, transcription, whisper_segments
+        audio_file_path, transcription, whisper_segments, cache
     )
@@ -10,6 +10,7 @@ Requisito 2: Almacenamiento Vectorial
 import os
 import uuid
 import asyncio
+from collections import OrderedDict
 from datetime import datetime
 from typing import Dict, Any, List, Optional, Tuple
 import structlog
@@ -24,6 +25,9 @@ from app.core.schemas import VectorStoreMetadata, VectorStoreResponse, VectorSto
 logger = structlog.get_logger(__name__)
 settings = get_settings()
 
+# Tamaño máximo de la caché LRU de embeddings de consultas
+QUERY_EMBEDDING_CACHE_SIZE = 2048
+
 
 class VectorStoreError(Exception):
     """Excepción personalizada para errores del vector store."""
@@ -46,6 +50,8 @@ class VectorStoreService:
         self.client = None
         self.collection = None
         self.embedding_model = None
+        self._query_embedding_cache: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+        self._pending_query_embeddings: Dict[str, asyncio.Future] = {}
         self._initialize_chroma()
         self._initialize_embedding_model()
         
@@ -221,6 +227,33 @@ class VectorStoreService:
         
         return embedding.tolist()
     
+    async def _generate_query_embedding(self, query: str) -> List[float]:
+        """
+        Generar embedding de una consulta con memoización LRU.
+        
+        Las consultas repetidas reutilizan el embedding calculado y las
+        solicitudes concurrentes de la misma consulta comparten un único cálculo.
+        """
+        cached = self._query_embedding_cache.get(query)
+        if cached is not None:
+            self._query_embedding_cache.move_to_end(query)
+            return list(cached)
+        
+        pending = self._pending_query_embeddings.get(query)
+        if pending is None:
+            pending = asyncio.ensure_future(self._generate_embedding(query))
+            self._pending_query_embeddings[query] = pending
+            pending.add_done_callback(
+                lambda _: self._pending_query_embeddings.pop(query, None)
+            )
+        
+        embedding = tuple(await pending)
+        self._query_embedding_cache[query] = embedding
+        while len(self._query_embedding_cache) > QUERY_EMBEDDING_CACHE_SIZE:
+            self._query_embedding_cache.popitem(last=False)
+        
+        return list(embedding)
+    
     def _prepare_metadata(
         self,
         conversation_id: str,
@@ -280,7 +313,7 @@ class VectorStoreService:
                 documents=[document],
                 ids=[vector_id]
             )
-
+        
         await loop.run_in_executor(None, add_to_collection)
     
     async def get_vector_store_status(self) -> VectorStoreStatus:
@@ -321,7 +354,7 @@ class VectorStoreService:
                     limit=limit,
                     include=["documents", "metadatas"]
                 )
-
+            
             results = await loop.run_in_executor(None, get_conversations)
             
             conversations = []
@@ -359,7 +392,7 @@ class VectorStoreService:
                     limit=1,
                     include=["documents", "metadatas"]
                 )
-
+            
             results = await loop.run_in_executor(None, get_conversation)
             
             if not results['ids']:
@@ -409,47 +442,14 @@ class VectorStoreService:
                        max_results=max_results,
                        threshold=similarity_threshold)
             
-            # Generar embedding de la consulta
-            query_embedding = await self._generate_embedding(query)
+            # Generar embedding de la consulta (memoizado)
+            query_embedding = await self._generate_query_embedding(query)
             
             # Ejecutar búsqueda en Chroma
-            loop = asyncio.get_event_loop()
-            
-            def query_collection():
-                return self.collection.query(
-                    query_embeddings=[query_embedding],
-                    n_results=max_results,
-                    where=metadata_filters,
-                    include=["documents", "metadatas", "distances"]
-                )
+            results = await self._query_collection([query_embedding], max_results, metadata_filters)
             
-            results = await loop.run_in_executor(None, query_collection)
-
             # Procesar y filtrar resultados
-            search_results = []
-            for i, (doc, metadata, distance) in enumerate(zip(
-                results['documents'][0], 
-                results['metadatas'][0], 
-                results['distances'][0]
-            )):
-                # Convertir distancia a similitud (Chroma usa distancia coseno)
-                similarity = 1 - distance
-                
-                # Filtrar por umbral de similitud
-                if similarity >= similarity_threshold:
-                    result = {
-                        "content": doc,
-                        "metadata": metadata,
-                        "similarity_score": similarity,
-                        "rank": i + 1,
-                        "conversation_id": metadata.get("conversation_id", "unknown"),
-                        "patient_name": metadata.get("patient_name"),
-                        "diagnosis": metadata.get("diagnosis"),
-                        "symptoms": metadata.get("symptoms"),
-                        "date": metadata.get("conversation_date"),
-                        "excerpt": self._create_excerpt(doc, query, max_length=200)
-                    }
-                    search_results.append(result)
+            search_results = self._build_semantic_results(query, results, 0, similarity_threshold)
             
             logger.info("Semantic search completed",
                        query=query,
@@ -464,6 +464,60 @@ class VectorStoreService:
                         error=str(e))
             return []
     
+    async def _query_collection(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int,
+        metadata_filters: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Consultar Chroma con uno o más embeddings en una sola llamada."""
+        loop = asyncio.get_event_loop()
+        
+        def query_collection():
+            return self.collection.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where=metadata_filters,
+                include=["documents", "metadatas", "distances"]
+            )
+        
+        return await loop.run_in_executor(None, query_collection)
+    
+    def _build_semantic_results(
+        self,
+        query: str,
+        results: Dict[str, Any],
+        query_index: int,
+        similarity_threshold: float
+    ) -> List[Dict[str, Any]]:
+        """Convertir resultados de Chroma de una consulta en resultados de búsqueda."""
+        search_results = []
+        for i, (doc, metadata, distance) in enumerate(zip(
+            results['documents'][query_index], 
+            results['metadatas'][query_index], 
+            results['distances'][query_index]
+        )):
+            # Convertir distancia a similitud (Chroma usa distancia coseno)
+            similarity = 1 - distance
+            
+            # Filtrar por umbral de similitud
+            if similarity >= similarity_threshold:
+                result = {
+                    "content": doc,
+                    "metadata": metadata,
+                    "similarity_score": similarity,
+                    "rank": i + 1,
+                    "conversation_id": metadata.get("conversation_id", "unknown"),
+                    "patient_name": metadata.get("patient_name"),
+                    "diagnosis": metadata.get("diagnosis"),
+                    "symptoms": metadata.get("symptoms"),
+                    "date": metadata.get("conversation_date"),
+                    "excerpt": self._create_excerpt(doc, query, max_length=200)
+                }
+                search_results.append(result)
+        
+        return search_results
+    
     async def search_by_patient(
         self,
         patient_name: str,
@@ -483,61 +537,15 @@ class VectorStoreService:
         try:
             logger.info("Searching by patient", patient_name=patient_name)
             
-            loop = asyncio.get_event_loop()
-            
             # ChromaDB no soporta $contains, así que usaremos búsqueda semántica + filtrado manual
             # Primero obtenemos TODOS los documentos y luego filtramos por similitud de nombres
-            
             try:
-                # Obtener todos los documentos (sin filtro de where)
-                results = await loop.run_in_executor(
-                    None,
-                    self.collection.get,
-                    None,                           # ids
-                    None,                           # where (sin filtro)
-                    None,                           # limit (todos los documentos)
-                    None,                          # offset
-                    None,                          # where_document
-                    ["documents", "metadatas"]      # include
-                )
-                
-                all_results = []
-                processed_conversations = set()
-                
-                # Filtrar manualmente por similitud de nombres
-                for doc, metadata in zip(results['documents'], results['metadatas']):
-                    conv_id = metadata.get("conversation_id", "unknown")
-                    stored_name = metadata.get("patient_name", "")
-                    
-                    # Evitar duplicados y nombres vacíos
-                    if conv_id not in processed_conversations and stored_name:
-                        processed_conversations.add(conv_id)
-                        
-                        # Calcular similitud de nombres
-                        similarity = self._calculate_name_similarity(patient_name, stored_name)
-                        
-                        # Solo incluir si hay similitud razonable
-                        if similarity > 0.3:
-                            result = {
-                                "content": doc,
-                                "metadata": metadata,
-                                "similarity_score": similarity,
-                                "conversation_id": conv_id,
-                                "patient_name": stored_name,
-                                "diagnosis": metadata.get("diagnosis"),
-                                "symptoms": metadata.get("symptoms"),
-                                "date": metadata.get("conversation_date"),
-                                "excerpt": self._create_excerpt(doc, patient_name, max_length=200)
-                            }
-                            all_results.append(result)
-                
+                results = await self._get_all_documents()
             except Exception as e:
                 logger.error(f"Patient search failed during data retrieval", error=str(e))
                 return []
             
-            # Ordenar por similitud y limitar resultados
-            all_results.sort(key=lambda x: x['similarity_score'], reverse=True)
-            final_results = all_results[:max_results]
+            final_results = self._match_patient_documents(patient_name, results, max_results)
             
             logger.info("Patient search completed",
                        patient_name=patient_name,
@@ -552,6 +560,61 @@ class VectorStoreService:
                         error=str(e))
             return []
     
+    async def _get_all_documents(self) -> Dict[str, Any]:
+        """Obtener todos los documentos de la colección (sin filtro de where)."""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None,
+            self.collection.get,
+            None,                           # ids
+            None,                           # where (sin filtro)
+            None,                           # limit (todos los documentos)
+            None,                          # offset
+            None,                          # where_document
+            ["documents", "metadatas"]      # include
+        )
+    
+    def _match_patient_documents(
+        self,
+        patient_name: str,
+        results: Dict[str, Any],
+        max_results: int
+    ) -> List[Dict[str, Any]]:
+        """Filtrar documentos por similitud de nombre de paciente."""
+        all_results = []
+        processed_conversations = set()
+        
+        # Filtrar manualmente por similitud de nombres
+        for doc, metadata in zip(results['documents'], results['metadatas']):
+            conv_id = metadata.get("conversation_id", "unknown")
+            stored_name = metadata.get("patient_name", "")
+            
+            # Evitar duplicados y nombres vacíos
+            if conv_id not in processed_conversations and stored_name:
+                processed_conversations.add(conv_id)
+                
+                # Calcular similitud de nombres
+                similarity = self._calculate_name_similarity(patient_name, stored_name)
+                
+                # Solo incluir si hay similitud razonable
+                if similarity > 0.3:
+                    result = {
+                        "content": doc,
+                        "metadata": metadata,
+                        "similarity_score": similarity,
+                        "conversation_id": conv_id,
+                        "patient_name": stored_name,
+                        "diagnosis": metadata.get("diagnosis"),
+                        "symptoms": metadata.get("symptoms"),
+                        "date": metadata.get("conversation_date"),
+                        "excerpt": self._create_excerpt(doc, patient_name, max_length=200)
+                    }
+                    all_results.append(result)
+        
+        # Ordenar por similitud y limitar resultados
+        all_results.sort(key=lambda x: x['similarity_score'], reverse=True)
+        return all_results[:max_results]
+    
     async def search_by_condition(
         self,
         condition: str,
@@ -572,30 +635,13 @@ class VectorStoreService:
             
             # Búsqueda semántica para capturar variaciones de la condición
             search_results = await self.semantic_search(
-                query=f"diagnóstico {condition} enfermedad",
+                query=self._condition_query(condition),
                 max_results=max_results * 2,  # Buscar más para luego filtrar
                 similarity_threshold=0.6,
                 metadata_filters=None
             )
             
-            # Filtrar y agrupar por paciente
-            patients_found = {}
-            for result in search_results:
-                patient_name = result.get("patient_name")
-                if patient_name and patient_name not in patients_found:
-                    # Verificar si la condición está en el diagnóstico o síntomas
-                    diagnosis = (result.get("diagnosis") or "").lower()
-                    symptoms = (result.get("symptoms") or "").lower()
-                    content = result.get("content", "").lower()
-                    condition_lower = condition.lower()
-                    
-                    if (condition_lower in diagnosis or 
-                        condition_lower in symptoms or 
-                        condition_lower in content):
-                        patients_found[patient_name] = result
-            
-            # Convertir a lista y limitar resultados
-            filtered_results = list(patients_found.values())[:max_results]
+            filtered_results = self._filter_condition_results(condition, search_results, max_results)
             
             logger.info("Condition search completed",
                        condition=condition,
@@ -609,6 +655,88 @@ class VectorStoreService:
                         error=str(e))
             return []
     
+    def _condition_query(self, condition: str) -> str:
+        """Consulta semántica usada para buscar una condición médica."""
+        return f"diagnóstico {condition} enfermedad"
+    
+    def _filter_condition_results(
+        self,
+        condition: str,
+        search_results: List[Dict[str, Any]],
+        max_results: int
+    ) -> List[Dict[str, Any]]:
+        """Filtrar resultados semánticos por condición y agrupar por paciente."""
+        patients_found = {}
+        condition_lower = condition.lower()
+        for result in search_results:
+            patient_name = result.get("patient_name")
+            if patient_name and patient_name not in patients_found:
+                # Verificar si la condición está en el diagnóstico o síntomas
+                diagnosis = (result.get("diagnosis") or "").lower()
+                symptoms = (result.get("symptoms") or "").lower()
+                content = result.get("content", "").lower()
+                
+                if (condition_lower in diagnosis or 
+                    condition_lower in symptoms or 
+                    condition_lower in content):
+                    patients_found[patient_name] = result
+        
+        # Convertir a lista y limitar resultados
+        return list(patients_found.values())[:max_results]
+    
+    async def search_batch(self, items: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Ejecutar varias búsquedas por paciente y/o condición en lote.
+        
+        Las búsquedas por paciente comparten una única lectura de la colección y
+        las búsquedas por condición se resuelven con una sola consulta a Chroma
+        con múltiples embeddings.
+        
+        Args:
+            items: Especificaciones de búsqueda con claves "type" ("patient" o
+                "condition"), "value" y "max_results" (opcional, default 10)
+            
+        Returns:
+            Lista de resultados por especificación, en el mismo orden de entrada
+        """
+        batch_results: List[List[Dict[str, Any]]] = [[] for _ in items]
+        patient_items = [(i, item) for i, item in enumerate(items) if item.get("type") == "patient"]
+        condition_items = [(i, item) for i, item in enumerate(items) if item.get("type") == "condition"]
+        
+        try:
+            logger.info("Starting batch search",
+                       patient_searches=len(patient_items),
+                       condition_searches=len(condition_items))
+            
+            if patient_items:
+                documents = await self._get_all_documents()
+                for i, item in patient_items:
+                    batch_results[i] = self._match_patient_documents(
+                        item["value"], documents, item.get("max_results", 10)
+                    )
+            
+            if condition_items:
+                queries = [self._condition_query(item["value"]) for _, item in condition_items]
+                query_embeddings = await asyncio.gather(
+                    *(self._generate_query_embedding(query) for query in queries)
+                )
+                n_results = max(item.get("max_results", 10) for _, item in condition_items) * 2
+                results = await self._query_collection(list(query_embeddings), n_results)
+                
+                for query_index, ((i, item), query) in enumerate(zip(condition_items, queries)):
+                    search_results = self._build_semantic_results(query, results, query_index, 0.6)
+                    batch_results[i] = self._filter_condition_results(
+                        item["value"], search_results, item.get("max_results", 10)
+                    )
+            
+            logger.info("Batch search completed",
+                       results_found=sum(len(r) for r in batch_results))
+            
+        except Exception as e:
+            logger.error("Batch search failed", error=str(e))
+        
+        return batch_results
+    
     def _calculate_name_similarity(self, search_name: str, stored_name: str) -> float:
         """
         Calcular similitud entre nombres para ranking.
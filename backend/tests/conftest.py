@@ -0,0 +1,149 @@
+"""
+Fixtures compartidas para los tests - ElSol Challenge.
+
+La base de datos de test es un SQLite en memoria con una única conexión
+compartida (StaticPool). Al vivir en memoria de cada proceso es segura para
+pytest-xdist: cada worker tiene su propia base de datos.
+Toda la sesión usa esa base de datos y un directorio temporal para Chroma,
+así que ejecutar los tests no deja archivos en el árbol del repositorio.
+"""
+
+import asyncio
+import sys
+from unittest.mock import Mock
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database.models import Base
+
+# uvloop llega con uvicorn[standard]; no existe en Windows
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+@pytest.fixture(scope="session")
+def event_loop_policy():
+    """Política de event loop para los tests async: uvloop si está disponible."""
+    if uvloop is not None and sys.platform != "win32":
+        return uvloop.EventLoopPolicy()
+    return asyncio.DefaultEventLoopPolicy()
+
+
+@pytest.fixture(scope="session")
+def db_engine():
+    """Motor SQLite en memoria; las tablas se crean una sola vez por sesión."""
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+
+    yield engine
+
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def db_session_factory(db_engine):
+    """Factoría de sesiones sobre la base de datos en memoria."""
+    return sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+
+
+@pytest.fixture(scope="session")
+def override_get_db(db_session_factory):
+    """Reemplazo de la dependencia get_db que usa la base de datos de test."""
+    def _get_db():
+        db = db_session_factory()
+        try:
+            yield db
+        finally:
+            db.rollback()
+            db.close()
+
+    return _get_db
+
+
+@pytest.fixture(scope="session", autouse=True)
+def isolated_storage(db_engine, db_session_factory, tmp_path_factory):
+    """
+    Redirigir la base de datos y el vector store de la app a recursos de test.
+
+    El lifespan, get_db y las tareas en segundo plano usan connection.engine y
+    connection.SessionLocal, y Chroma persiste en CHROMA_PERSIST_DIRECTORY: sin
+    este reemplazo una ejecución crea ./conversations.db y reescribe ./chroma_db.
+    """
+    from app.core.config import get_settings
+    from app.database import connection
+
+    patcher = pytest.MonkeyPatch()
+    patcher.setattr(connection, "engine", db_engine)
+    patcher.setattr(connection, "SessionLocal", db_session_factory)
+    patcher.setattr(get_settings(), "CHROMA_PERSIST_DIRECTORY", str(tmp_path_factory.mktemp("chroma")))
+
+    yield
+
+    patcher.undo()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient compartido; el lifespan de la app se ejecuta una sola vez."""
+    # Import diferido: los tests unitarios de servicios no necesitan la app
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+async def aclient():
+    """Cliente httpx asíncrono sobre ASGI; las requests corren en el loop del test."""
+    import httpx
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+        yield async_client
+
+
+@pytest.fixture(scope="session")
+def upload_dir(tmp_path_factory):
+    """Directorio temporal único para los archivos subidos; pytest lo limpia en bloque."""
+    return tmp_path_factory.mktemp("docs")
+
+
+@pytest.fixture(scope="session")
+def speaker_service_singleton():
+    """Servicio de diarización compartido: se construye una sola vez por sesión."""
+    from app.services.speaker_service import get_speaker_service
+
+    return get_speaker_service()
+
+
+@pytest.fixture
+def spy_extractor():
+    """Extractor por defecto envuelto en un Mock: cuenta las llamadas sin alterar los resultados."""
+    from app.services.speaker_features import get_default_extractor
+
+    extractor = get_default_extractor()
+    return Mock(
+        wraps=extractor,
+        sample_rate=extractor.sample_rate,
+        n_fft=extractor.n_fft,
+        hop_length=extractor.hop_length
+    )
+
+
+@pytest.fixture(scope="session")
+def fake_wav_path(tmp_path_factory):
+    """Único archivo WAV falso por sesión; los tests que necesitan audio distinto usan arreglos numpy."""
+    path = tmp_path_factory.mktemp("audio") / "fake.wav"
+    path.write_bytes(b"fake audio content")
+    return str(path)
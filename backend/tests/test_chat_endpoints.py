@@ -5,12 +5,14 @@ Tests para verificar el funcionamiento de los endpoints de chat médico.
 Requisito 3: Chatbot vía API
 """
 
+import orjson
 import pytest
 from unittest.mock import Mock, patch, AsyncMock
 from fastapi.testclient import TestClient
 
 from app.main import app
 from app.core.schemas import ChatResponse, ChatSource, ChatQuery
+from app.services.chat_service import get_chat_service
 
 
 class TestChatEndpoints:
@@ -118,6 +120,30 @@ class TestChatEndpoints:
         assert data["intent"] == "condition_list"
         assert len(data["sources"]) == 2
     
+    def test_chat_response_serialization_uses_orjson(self):
+        """Test que la respuesta del chat se serializa con orjson."""
+        mock_service = Mock()
+        mock_service.process_chat_query = AsyncMock(return_value=ChatResponse(
+            answer="Pepito Gómez presenta diabetes tipo 2.",
+            sources=[],
+            confidence=0.8,
+            intent="patient_info"
+        ))
+        app.dependency_overrides[get_chat_service] = lambda: mock_service
+        
+        try:
+            with patch('orjson.dumps', wraps=orjson.dumps) as mock_dumps:
+                response = self.client.post(
+                    "/api/v1/chat",
+                    json={"query": "¿Qué enfermedad tiene Pepito Gómez?"}
+                )
+        finally:
+            app.dependency_overrides.pop(get_chat_service, None)
+        
+        assert response.status_code == 200
+        assert response.json()["answer"] == "Pepito Gómez presenta diabetes tipo 2."
+        mock_dumps.assert_called_once()
+    
     def test_chat_endpoint_validation_error(self):
         """Test validación de parámetros inválidos."""
         # Query muy corta
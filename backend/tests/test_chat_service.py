@@ -7,6 +7,7 @@ con RAG (Retrieval-Augmented Generation).
 Requisito 3: Chatbot vía API
 """
 
+import copy
 import pytest
 import asyncio
 from unittest.mock import Mock, patch, AsyncMock
@@ -15,6 +16,8 @@ from datetime import datetime
 from app.services.chat_service import (
     ChatService, 
     ChatServiceError, 
+    ContextRow,
+    SemanticQueryCache,
     get_chat_service,
     process_medical_query
 )
@@ -24,6 +27,44 @@ from app.core.schemas import (
 )
 
 
+SAMPLE_VECTOR_RESULTS = [
+    {
+        "content": "Paciente Juan Pérez de 45 años presenta hipertensión arterial. Diagnóstico confirmado por Dr. García.",
+        "metadata": {
+            "conversation_id": "conv-123",
+            "patient_name": "Juan Pérez", 
+            "diagnosis": "Hipertensión arterial",
+            "conversation_date": "2024-01-15"
+        },
+        "similarity_score": 0.95,
+        "rank": 1,
+        "conversation_id": "conv-123",
+        "patient_name": "Juan Pérez",
+        "diagnosis": "Hipertensión arterial",
+        "symptoms": "dolor de cabeza, mareos",
+        "date": "2024-01-15",
+        "excerpt": "Paciente Juan Pérez de 45 años presenta hipertensión arterial..."
+    },
+    {
+        "content": "Seguimiento de Juan Pérez. Presión controlada con medicamento. Continúa tratamiento.",
+        "metadata": {
+            "conversation_id": "conv-124",
+            "patient_name": "Juan Pérez",
+            "diagnosis": "Hipertensión arterial", 
+            "conversation_date": "2024-01-20"
+        },
+        "similarity_score": 0.87,
+        "rank": 2,
+        "conversation_id": "conv-124",
+        "patient_name": "Juan Pérez",
+        "diagnosis": "Hipertensión arterial",
+        "symptoms": "",
+        "date": "2024-01-20",
+        "excerpt": "Seguimiento de Juan Pérez. Presión controlada..."
+    }
+]
+
+
 class TestChatService:
     """Tests para el servicio de chat RAG."""
     
@@ -34,6 +75,7 @@ class TestChatService:
         mock_service.semantic_search = AsyncMock()
         mock_service.search_by_patient = AsyncMock()
         mock_service.search_by_condition = AsyncMock()
+        mock_service.search_batch = AsyncMock()
         return mock_service
     
     @pytest.fixture
@@ -45,51 +87,23 @@ class TestChatService:
     
     @pytest.fixture
     def sample_vector_results(self):
-        """Resultados de ejemplo del vector store."""
-        return [
-            {
-                "content": "Paciente Juan Pérez de 45 años presenta hipertensión arterial. Diagnóstico confirmado por Dr. García.",
-                "metadata": {
-                    "conversation_id": "conv-123",
-                    "patient_name": "Juan Pérez", 
-                    "diagnosis": "Hipertensión arterial",
-                    "conversation_date": "2024-01-15"
-                },
-                "similarity_score": 0.95,
-                "rank": 1,
-                "conversation_id": "conv-123",
-                "patient_name": "Juan Pérez",
-                "diagnosis": "Hipertensión arterial",
-                "symptoms": "dolor de cabeza, mareos",
-                "date": "2024-01-15",
-                "excerpt": "Paciente Juan Pérez de 45 años presenta hipertensión arterial..."
-            },
-            {
-                "content": "Seguimiento de Juan Pérez. Presión controlada con medicamento. Continúa tratamiento.",
-                "metadata": {
-                    "conversation_id": "conv-124",
-                    "patient_name": "Juan Pérez",
-                    "diagnosis": "Hipertensión arterial", 
-                    "conversation_date": "2024-01-20"
-                },
-                "similarity_score": 0.87,
-                "rank": 2,
-                "conversation_id": "conv-124",
-                "patient_name": "Juan Pérez",
-                "diagnosis": "Hipertensión arterial",
-                "symptoms": "",
-                "date": "2024-01-20",
-                "excerpt": "Seguimiento de Juan Pérez. Presión controlada..."
-            }
-        ]
+        """Resultados de ejemplo del vector store (copia por test, los tests los mutan)."""
+        return copy.deepcopy(SAMPLE_VECTOR_RESULTS)
+    
+    @pytest.fixture(scope="class")
+    def shared_chat_service(self):
+        """Instancia de ChatService construida una sola vez por clase."""
+        with patch('app.services.chat_service.get_vector_service', return_value=Mock()):
+            with patch('app.services.chat_service.get_openai_service', return_value=Mock()):
+                return ChatService()
     
     @pytest.fixture
-    def chat_service(self, mock_vector_service, mock_openai_service):
-        """Instancia de ChatService con mocks."""
-        with patch('app.services.chat_service.get_vector_service', return_value=mock_vector_service):
-            with patch('app.services.chat_service.get_openai_service', return_value=mock_openai_service):
-                service = ChatService()
-                return service
+    def chat_service(self, shared_chat_service, mock_vector_service, mock_openai_service):
+        """Instancia de ChatService con mocks frescos para cada test."""
+        shared_chat_service.vector_service = mock_vector_service
+        shared_chat_service.openai_service = mock_openai_service
+        shared_chat_service._semantic_cache = None
+        return shared_chat_service
     
     def test_chat_service_initialization(self, chat_service):
         """Test inicialización del servicio de chat."""
@@ -111,6 +125,10 @@ class TestChatService:
         # Test con espacios extra
         result = chat_service._normalize_query("  Consulta   con   espacios  ")
         assert result == "consulta con espacios"
+        
+        # Comas y puntos se conservan: separan cláusulas y decimales
+        result = chat_service._normalize_query("Paciente Juan, dosis de 1.5 mg")
+        assert result == "paciente juan, dosis de 1.5 mg"
     
     def test_detect_intent(self, chat_service):
         """Test detección de intenciones."""
@@ -139,7 +157,7 @@ class TestChatService:
         query = "que enfermedad tiene Juan Perez con diabetes"
         intent = ChatIntent.PATIENT_INFO
         
-        entities = chat_service._extract_entities(query, intent)
+        entities = chat_service._extract_entities(query, chat_service._normalize_query(query), intent)
         
         # El regex busca nombres con capitalización correcta
         # Si no encuentra "Juan Perez", verificar que la estructura sea correcta
@@ -149,6 +167,21 @@ class TestChatService:
         assert isinstance(entities["medications"], list)
         assert isinstance(entities["dates"], list)
     
+    def test_extract_entities_vocabulary_lookup(self, chat_service):
+        """Test extracción de vocabulario médico sin depender de acentos."""
+        query = "Pacientes con hipertension, estreñimiento y dolor de cabeza que toman losartan"
+        
+        entities = chat_service._extract_entities(
+            query, chat_service._normalize_query(query), ChatIntent.SYMPTOM_SEARCH
+        )
+        
+        assert "hipertensión" in entities["conditions"]
+        assert "migraña" in entities["conditions"]
+        assert "estreñimiento" in entities["symptoms"]
+        assert "dolor de cabeza" in entities["symptoms"]
+        assert "tos" not in entities["symptoms"]
+        assert entities["medications"] == ["losartan"]
+    
     def test_generate_search_terms(self, chat_service):
         """Test generación de términos de búsqueda."""
         query = "que tiene juan con diabetes"
@@ -218,11 +251,65 @@ class TestChatService:
         
         # Verificaciones
         assert len(contexts) == 2
-        assert contexts[0]["patient_name"] == "Juan Pérez"
+        assert contexts[0].patient_name == "Juan Pérez"
         chat_service.vector_service.search_by_patient.assert_called_once_with(
             patient_name="Juan Pérez", max_results=5
         )
     
+    @pytest.mark.asyncio
+    async def test_retrieve_context_full_name_searched_once(self, chat_service, sample_vector_results):
+        """Test que los fragmentos de un nombre completo no generen búsquedas propias."""
+        # Setup - el extractor devuelve el nombre completo junto con sus partes
+        chat_service.vector_service.search_by_patient.return_value = sample_vector_results
+        
+        analysis = QueryAnalysis(
+            original_query="¿Qué enfermedad tiene Juan Pérez?",
+            intent=ChatIntent.PATIENT_INFO,
+            entities={"patients": ["Juan", "Perez", "Juan Perez"], "conditions": [], "symptoms": [], "medications": [], "dates": []},
+            normalized_query="que enfermedad tiene juan perez",
+            search_terms=["Juan Perez", "enfermedad"],
+            filters={}
+        )
+        
+        # Test
+        await chat_service._retrieve_context(analysis, 5, None)
+        
+        # Verificaciones
+        chat_service.vector_service.search_by_patient.assert_called_once_with(
+            patient_name="Juan Perez", max_results=5
+        )
+        chat_service.vector_service.search_batch.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_retrieve_context_multiple_patients(self, chat_service, sample_vector_results):
+        """Test recuperación en lote cuando se detectan varios pacientes."""
+        # Setup - cada paciente devuelve una conversación distinta
+        chat_service.vector_service.search_batch.return_value = [
+            [sample_vector_results[0]],
+            [sample_vector_results[1]]
+        ]
+        
+        analysis = QueryAnalysis(
+            original_query="¿Qué enfermedad tienen Juan Pérez y María García?",
+            intent=ChatIntent.PATIENT_INFO,
+            entities={"patients": ["Juan Pérez", "María García"], "conditions": [], "symptoms": [], "medications": [], "dates": []},
+            normalized_query="que enfermedad tienen juan perez y maria garcia",
+            search_terms=["Juan Pérez", "María García"],
+            filters={}
+        )
+        
+        # Test
+        contexts = await chat_service._retrieve_context(analysis, 5, None)
+        
+        # Verificaciones
+        assert chat_service.vector_service.search_batch.await_count == 1
+        chat_service.vector_service.search_by_patient.assert_not_called()
+        chat_service.vector_service.search_batch.assert_awaited_once_with([
+            {"type": "patient", "value": "Juan Pérez", "max_results": 5},
+            {"type": "patient", "value": "María García", "max_results": 5}
+        ])
+        assert {c.conversation_id for c in contexts} == {"conv-123", "conv-124"}
+    
     @pytest.mark.asyncio
     async def test_retrieve_context_condition_list(self, chat_service, sample_vector_results):
         """Test recuperación de contexto para lista por condición."""
@@ -244,7 +331,7 @@ class TestChatService:
         
         # Verificaciones
         assert len(contexts) == 1
-        assert contexts[0]["diagnosis"] == "Hipertensión arterial"
+        assert contexts[0].diagnosis == "Hipertensión arterial"
         chat_service.vector_service.search_by_condition.assert_called_once_with(
             condition="hipertensión", max_results=5
         )
@@ -260,20 +347,22 @@ class TestChatService:
             filters={}
         )
         
-        ranked = chat_service._rank_contexts(sample_vector_results, analysis)
+        contexts = [ContextRow.from_search_result(r) for r in sample_vector_results]
+        ranked = chat_service._rank_contexts(contexts, analysis)
         
         # Verificar que se mantiene el orden por puntuación
         assert len(ranked) == 2
-        assert ranked[0]["final_score"] >= ranked[1]["final_score"]
-        assert all("final_score" in context for context in ranked)
+        assert ranked[0].final_score >= ranked[1].final_score
+        assert all(context.final_score is not None for context in ranked)
     
     def test_prepare_final_context(self, chat_service, sample_vector_results):
         """Test preparación del contexto final."""
         # Agregar final_score a los resultados
-        for i, result in enumerate(sample_vector_results):
-            result["final_score"] = 0.9 - (i * 0.1)
+        contexts = [ContextRow.from_search_result(r) for r in sample_vector_results]
+        for i, row in enumerate(contexts):
+            row.final_score = 0.9 - (i * 0.1)
         
-        context = chat_service._prepare_final_context(sample_vector_results)
+        context = chat_service._prepare_final_context(contexts)
         
         assert isinstance(context, str)
         assert "Juan Pérez" in context
@@ -281,6 +370,29 @@ class TestChatService:
         assert "CONVERSACIÓN 2:" in context
         assert len(context) <= 4100  # Con margen para el truncado
     
+    def test_prepare_final_context_truncation(self, chat_service):
+        """Test que el contexto respeta el presupuesto de caracteres."""
+        contexts = [
+            ContextRow(
+                content=f"Paciente-{i:02d} " + "x" * 900,
+                conversation_id=f"conv-{i}",
+                similarity_score=0.9,
+                patient_name=f"Paciente-{i:02d}",
+                diagnosis="Hipertensión arterial",
+                symptoms="mareos",
+                date="2024-01-15"
+            )
+            for i in range(50)
+        ]
+        
+        context = chat_service._prepare_final_context(contexts)
+        
+        assert len(context) <= 4100
+        assert "CONVERSACIÓN 1:" in context
+        assert "CONVERSACIÓN 5:" not in context
+        assert "Paciente-49" not in context
+        assert "[Contexto truncado...]" in context
+    
     def test_prepare_final_context_empty(self, chat_service):
         """Test preparación de contexto con resultados vacíos."""
         context = chat_service._prepare_final_context([])
@@ -315,13 +427,96 @@ class TestChatService:
         assert "Esta información proviene de conversaciones registradas" in answer
         chat_service.openai_service._call_openai_api.assert_called_once()
     
+    @pytest.mark.asyncio
+    async def test_generate_answer_streaming(self, chat_service):
+        """Test generación de respuesta en streaming con disclaimer final."""
+        # Setup - el stream entrega la respuesta en fragmentos
+        fragments = ["Juan Pérez presenta ", "hipertensión arterial ", "según el diagnóstico."]
+        
+        async def fake_stream(messages):
+            for fragment in fragments:
+                yield fragment
+        
+        chat_service.openai_service._stream_openai_chat_api = fake_stream
+        
+        analysis = QueryAnalysis(
+            original_query="¿Qué enfermedad tiene Juan Pérez?",
+            intent=ChatIntent.PATIENT_INFO,
+            entities={"patients": ["Juan Pérez"], "conditions": [], "symptoms": [], "medications": [], "dates": []},
+            normalized_query="que enfermedad tiene juan perez",
+            search_terms=["Juan Pérez"],
+            filters={}
+        )
+        
+        # Test
+        chunks = [chunk async for chunk in chat_service._generate_answer_stream(analysis, "contexto")]
+        answer = "".join(chunks)
+        
+        # Verificaciones
+        assert len(chunks) > 1
+        assert answer == chat_service._validate_response("".join(fragments), analysis)
+        assert answer.startswith("".join(fragments).strip())
+        assert answer.endswith("consulte siempre con un profesional de la salud.")
+    
+    @pytest.mark.asyncio
+    async def test_generate_answer_streaming_truncates_after_disclaimer(self, chat_service):
+        """Test que el stream agregue el disclaimer antes de truncar, igual que _validate_response."""
+        # Setup - respuesta médica justo bajo el límite: el disclaimer lo excede
+        fragments = ["El diagnóstico es ", "a" * 1970, "   "]
+        
+        async def fake_stream(messages):
+            for fragment in fragments:
+                yield fragment
+        
+        chat_service.openai_service._stream_openai_chat_api = fake_stream
+        
+        analysis = QueryAnalysis(
+            original_query="¿Cuál es el diagnóstico?",
+            intent=ChatIntent.GENERAL_QUERY,
+            entities={"patients": [], "conditions": [], "symptoms": [], "medications": [], "dates": []},
+            normalized_query="cual es el diagnostico",
+            search_terms=["diagnostico"],
+            filters={}
+        )
+        
+        # Test
+        chunks = [chunk async for chunk in chat_service._generate_answer_stream(analysis, "contexto")]
+        answer = "".join(chunks)
+        
+        # Verificaciones
+        assert answer == chat_service._validate_response("".join(fragments), analysis)
+        assert answer.endswith("...")
+        assert answer.startswith("El diagnóstico es " + "a" * 1970 + "\n\n⚠️")
+    
+    def test_build_answer_messages_templates(self, chat_service):
+        """Test que los prompts se generan desde los templates precompilados."""
+        analysis = QueryAnalysis(
+            original_query="¿Quién tiene dolor de cabeza?",
+            intent=ChatIntent.SYMPTOM_SEARCH,
+            entities={"patients": [], "conditions": [], "symptoms": ["dolor de cabeza"], "medications": [], "dates": []},
+            normalized_query="quien tiene dolor de cabeza",
+            search_terms=["dolor de cabeza"],
+            filters={}
+        )
+        
+        # Test - el contexto puede contener "$" sin romper la sustitución
+        messages = chat_service._build_answer_messages(analysis, "Costo consulta: $50")
+        
+        # Verificaciones
+        assert messages[0]["role"] == "system"
+        prompt = messages[1]["content"]
+        assert "Costo consulta: $50" in prompt
+        assert "CONSULTA: ¿Quién tiene dolor de cabeza?" in prompt
+        assert "ENTIDADES DETECTADAS: symptoms: dolor de cabeza" in prompt
+    
     def test_prepare_sources(self, chat_service, sample_vector_results):
         """Test preparación de fuentes."""
         # Agregar final_score
-        for result in sample_vector_results:
-            result["final_score"] = result["similarity_score"]
+        contexts = [ContextRow.from_search_result(r) for r in sample_vector_results]
+        for row in contexts:
+            row.final_score = row.similarity_score
         
-        sources = chat_service._prepare_sources(sample_vector_results)
+        sources = chat_service._prepare_sources(contexts)
         
         assert len(sources) <= 5  # Máximo 5 fuentes
         assert all(isinstance(source, ChatSource) for source in sources)
@@ -331,8 +526,9 @@ class TestChatService:
     def test_calculate_confidence(self, chat_service, sample_vector_results):
         """Test cálculo de confianza."""
         # Agregar final_score
-        for result in sample_vector_results:
-            result["final_score"] = result["similarity_score"]
+        contexts = [ContextRow.from_search_result(r) for r in sample_vector_results]
+        for row in contexts:
+            row.final_score = row.similarity_score
         
         analysis = QueryAnalysis(
             original_query="¿Qué enfermedad tiene Juan Pérez?",
@@ -343,11 +539,37 @@ class TestChatService:
             filters={}
         )
         
-        confidence = chat_service._calculate_confidence(sample_vector_results, analysis)
+        confidence = chat_service._calculate_confidence(contexts, analysis)
         
         assert 0.0 <= confidence <= 1.0
         assert isinstance(confidence, float)
     
+    def test_calculate_confidence_follows_score(self, chat_service, sample_vector_results):
+        """Test que la confianza siga la puntuación de ranking de los contextos."""
+        analysis = QueryAnalysis(
+            original_query="¿Qué enfermedad tiene Juan Pérez?",
+            intent=ChatIntent.PATIENT_INFO,
+            entities={"patients": ["Juan Pérez"], "conditions": [], "symptoms": [], "medications": [], "dates": []},
+            normalized_query="que enfermedad tiene juan perez",
+            search_terms=["Juan Pérez"],
+            filters={}
+        )
+        
+        close = [
+            ContextRow.from_search_result({**r, "final_score": 0.6})
+            for r in sample_vector_results
+        ]
+        distant = [
+            ContextRow.from_search_result({**r, "final_score": 0.0})
+            for r in sample_vector_results
+        ]
+        
+        high = chat_service._calculate_confidence(close, analysis)
+        low = chat_service._calculate_confidence(distant, analysis)
+        
+        assert 0.0 <= low < high <= 1.0
+        assert low == 0.2  # Solo bonus por entidades y número de fuentes
+    
     def test_calculate_confidence_empty(self, chat_service):
         """Test cálculo de confianza con contextos vacíos."""
         analysis = QueryAnalysis(
@@ -403,6 +625,93 @@ class TestChatService:
         assert 0.0 <= response.confidence <= 1.0
         assert response.intent == "patient_info"
         assert response.processing_time_ms >= 0  # Puede ser 0 con mocks muy rápidos
+        # Un único nombre completo: búsqueda directa, sin lote por fragmentos del nombre
+        chat_service.vector_service.search_by_patient.assert_awaited_once_with(
+            patient_name="Juan Perez", max_results=5
+        )
+        chat_service.vector_service.search_batch.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_process_chat_query_no_sources_skips_construction(self, chat_service, sample_vector_results):
+        """Test que include_sources=False no construye objetos ChatSource."""
+        chat_service.vector_service.search_by_patient.return_value = sample_vector_results
+        
+        query = ChatQuery(
+            query="¿Qué enfermedad tiene Juan Pérez?",
+            max_results=5,
+            include_sources=False
+        )
+        
+        with patch('app.services.chat_service.ChatSource') as mock_chat_source:
+            response = await chat_service.process_chat_query(query)
+        
+        assert response.sources == []
+        assert mock_chat_source.call_count == 0
+    
+    @pytest.mark.asyncio
+    async def test_semantic_cache_hit(self, chat_service, sample_vector_results):
+        """Test que consultas equivalentes reutilizan la respuesta cacheada."""
+        # Setup - ambas formulaciones producen el mismo embedding
+        chat_service._semantic_cache = SemanticQueryCache(threshold=0.92, ttl_seconds=300)
+        chat_service.vector_service._generate_query_embedding = AsyncMock(return_value=[0.6, 0.8, 0.0])
+        chat_service.vector_service.search_by_patient.return_value = sample_vector_results
+        chat_service.openai_service._call_openai_chat_api = AsyncMock(
+            return_value="Pepito Gómez presenta diabetes tipo 2."
+        )
+        
+        # Test
+        first = await chat_service.process_chat_query(ChatQuery(query="¿Qué enfermedad tiene Pepito Gómez?"))
+        second = await chat_service.process_chat_query(ChatQuery(query="¿Que enfermedad tiene Pepito Gomez?"))
+        
+        # Verificaciones
+        assert second.answer == first.answer
+        assert second.query_classification["source"] == "semantic_cache"
+        chat_service.openai_service._call_openai_chat_api.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_semantic_cache_isolated_per_patient(self, chat_service, sample_vector_results):
+        """Test que preguntas casi idénticas sobre pacientes distintos no compartan respuesta."""
+        # Setup - mismo embedding para ambas preguntas
+        chat_service._semantic_cache = SemanticQueryCache(threshold=0.92, ttl_seconds=300)
+        chat_service.vector_service._generate_query_embedding = AsyncMock(return_value=[0.6, 0.8, 0.0])
+        chat_service.vector_service.search_by_patient.return_value = sample_vector_results
+        chat_service.vector_service.semantic_search.return_value = sample_vector_results
+        chat_service.openai_service._call_openai_chat_api = AsyncMock(
+            side_effect=["Juan toma metformina.", "María toma losartán."]
+        )
+        
+        # Test
+        juan = await chat_service.process_chat_query(ChatQuery(query="¿Qué medicamentos toma Juan?"))
+        maria = await chat_service.process_chat_query(ChatQuery(query="¿Qué medicamentos toma María?"))
+        
+        # Verificaciones
+        assert juan.answer != maria.answer
+        assert "source" not in maria.query_classification
+        assert chat_service.openai_service._call_openai_chat_api.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_semantic_cache_ttl_expiry(self, chat_service, sample_vector_results):
+        """Test que las entradas expiradas de la caché no se reutilizan."""
+        # Setup - reloj controlado manualmente
+        now = [1000.0]
+        chat_service._semantic_cache = SemanticQueryCache(
+            threshold=0.92, ttl_seconds=300, clock=lambda: now[0]
+        )
+        chat_service.vector_service._generate_query_embedding = AsyncMock(return_value=[0.6, 0.8, 0.0])
+        chat_service.vector_service.search_by_patient.return_value = sample_vector_results
+        chat_service.openai_service._call_openai_chat_api = AsyncMock(
+            return_value="Pepito Gómez presenta diabetes tipo 2."
+        )
+        query = ChatQuery(query="¿Qué enfermedad tiene Pepito Gómez?")
+        
+        # Test
+        await chat_service.process_chat_query(query)
+        now[0] += 301
+        response = await chat_service.process_chat_query(query)
+        
+        # Verificaciones
+        assert "source" not in response.query_classification
+        assert chat_service.openai_service._call_openai_chat_api.call_count == 2
     
     @pytest.mark.asyncio
     async def test_process_chat_query_error_handling(self, chat_service):
@@ -449,19 +758,55 @@ class TestChatServiceIntegration:
     
     def test_get_chat_service_singleton(self):
         """Test que get_chat_service retorna singleton."""
-        with patch('app.services.chat_service.ChatService') as mock_service_class:
-            mock_instance = Mock()
-            mock_service_class.return_value = mock_instance
-            
-            # Primera llamada
-            service1 = get_chat_service()
-            # Segunda llamada
-            service2 = get_chat_service()
-            
-            # Debe ser la misma instancia
-            assert service1 is service2
-            # Solo debe crear una instancia
-            mock_service_class.assert_called_once()
+        get_chat_service.cache_clear()
+        try:
+            with patch('app.services.chat_service.ChatService') as mock_service_class:
+                mock_instance = Mock()
+                mock_service_class.return_value = mock_instance
+                
+                # Primera llamada
+                service1 = get_chat_service()
+                # Segunda llamada
+                service2 = get_chat_service()
+                
+                # Debe ser la misma instancia
+                assert service1 is service2
+                # Solo debe crear una instancia
+                mock_service_class.assert_called_once()
+        finally:
+            get_chat_service.cache_clear()
+
+
+class FakeVectorService:
+    """Stub ligero del vector service: retorna datos fijos sin registrar llamadas."""
+    
+    def __init__(self):
+        self._pat_results = []
+        self._cond_results = []
+        self._semantic_results = []
+    
+    async def search_by_patient(self, **kwargs):
+        return self._pat_results
+    
+    async def search_by_condition(self, **kwargs):
+        return self._cond_results
+    
+    async def semantic_search(self, **kwargs):
+        return self._semantic_results
+    
+    async def search_batch(self, items):
+        results = {"patient": self._pat_results, "condition": self._cond_results}
+        return [results[item["type"]] for item in items]
+
+
+class FakeOpenAIService:
+    """Stub ligero del OpenAI service: retorna una respuesta fija."""
+    
+    def __init__(self):
+        self._answer = ""
+    
+    async def _call_openai_chat_api(self, messages):
+        return self._answer
 
 
 # Tests de casos de uso específicos
@@ -471,20 +816,14 @@ class TestChatSpecificUseCases:
     @pytest.fixture
     def chat_service_with_real_data(self):
         """Chat service con datos de prueba realistas."""
-        with patch('app.services.chat_service.get_vector_service') as mock_vector:
-            with patch('app.services.chat_service.get_openai_service') as mock_openai:
-                # Configurar mocks con datos realistas
-                mock_vector_service = Mock()
-                mock_openai_service = Mock()
-                
-                mock_vector.return_value = mock_vector_service
-                mock_openai.return_value = mock_openai_service
-                
+        fake_vector_service = FakeVectorService()
+        fake_openai_service = FakeOpenAIService()
+        
+        with patch('app.services.chat_service.get_vector_service', return_value=fake_vector_service):
+            with patch('app.services.chat_service.get_openai_service', return_value=fake_openai_service):
                 service = ChatService()
-                service.vector_service = mock_vector_service
-                service.openai_service = mock_openai_service
                 
-                return service, mock_vector_service, mock_openai_service
+                return service, fake_vector_service, fake_openai_service
     
     @pytest.mark.asyncio
     async def test_pepito_gomez_case(self, chat_service_with_real_data):
@@ -503,8 +842,8 @@ class TestChatSpecificUseCases:
             "excerpt": "Pepito Gómez presenta diabetes tipo 2..."
         }]
         
-        mock_vector.search_by_patient.return_value = pepito_data
-        mock_openai._call_openai_api.return_value = "Según las transcripciones, Pepito Gómez presenta diabetes tipo 2, controlada con metformina."
+        mock_vector._pat_results = pepito_data
+        mock_openai._answer = "Según las transcripciones, Pepito Gómez presenta diabetes tipo 2, controlada con metformina."
         
         query = ChatQuery(query="¿Qué enfermedad tiene Pepito Gómez?")
         response = await chat_service.process_chat_query(query)
@@ -540,8 +879,8 @@ class TestChatSpecificUseCases:
             }
         ]
         
-        mock_vector.search_by_condition.return_value = diabetes_data
-        mock_openai._call_openai_api.return_value = "Pacientes con diabetes: 1. Pepito Gómez (diabetes tipo 2), 2. María García (diabetes gestacional)"
+        mock_vector._cond_results = diabetes_data
+        mock_openai._answer = "Pacientes con diabetes: 1. Pepito Gómez (diabetes tipo 2), 2. María García (diabetes gestacional)"
         
         query = ChatQuery(query="Listame los pacientes con diabetes")
         response = await chat_service.process_chat_query(query)
@@ -0,0 +1,82 @@
+"""
+Tests para la extracción de características por tramas - ElSol Challenge.
+
+PLUS Feature 5: Diferenciación de Hablantes
+"""
+
+import pytest
+import numpy as np
+
+from app.services.speaker_features import (
+    extract_frame_features, frame_signal, make_extractor,
+    get_default_extractor, _rms_zcr_numpy, _rms_zcr_kernel
+)
+
+
+SR = 16000
+
+
+class TestSpeakerFeatures:
+    """Tests para las características de audio por trama."""
+    
+    def test_frame_signal_centered(self):
+        """Test que el framing centrado produzca una trama por salto."""
+        frames = frame_signal(np.zeros(SR, dtype=np.float32), 2048, 512)
+        
+        assert frames.shape == (1 + SR // 512, 2048)
+    
+    def test_rms_of_constant_signal(self):
+        """Test RMS de una señal constante sin padding en la trama central."""
+        y = np.full(SR, 0.5, dtype=np.float32)
+        
+        rms, _, _ = extract_frame_features(y, SR)
+        
+        assert rms[len(rms) // 2] == pytest.approx(0.5, rel=1e-5)
+    
+    def test_zero_crossing_rate_of_alternating_signal(self):
+        """Test ZCR máximo para una señal que cambia de signo en cada muestra."""
+        y = np.tile(np.array([1.0, -1.0], dtype=np.float32), SR // 2)
+        
+        _, zcr, _ = extract_frame_features(y, SR)
+        
+        assert zcr[len(zcr) // 2] == pytest.approx(1.0, abs=1e-3)
+    
+    def test_spectral_centroid_of_pure_tone(self):
+        """Test que el centroide de un tono puro quede cerca de su frecuencia."""
+        t = np.arange(SR) / SR
+        y = np.sin(2 * np.pi * 1000 * t).astype(np.float32)
+        
+        _, _, centroid = extract_frame_features(y, SR)
+        
+        assert centroid[len(centroid) // 2] == pytest.approx(1000, rel=0.05)
+    
+    def test_kernel_matches_numpy_reference(self):
+        """Test que el kernel compilado coincida con la versión numpy."""
+        rng = np.random.default_rng(0)
+        frames = frame_signal(rng.standard_normal(SR).astype(np.float32), 2048, 512)
+        
+        rms, zcr = _rms_zcr_kernel(frames)
+        ref_rms, ref_zcr = _rms_zcr_numpy(frames)
+        
+        np.testing.assert_allclose(rms, ref_rms, rtol=1e-4)
+        np.testing.assert_allclose(zcr, ref_zcr)
+    
+    def test_specialized_extractor_matches_generic(self):
+        """Test que el extractor especializado coincida con el genérico."""
+        rng = np.random.default_rng(1)
+        y = rng.standard_normal(SR).astype(np.float32)
+        
+        specialized = make_extractor(SR, 512, 160)(y)
+        generic = extract_frame_features(y, SR, frame_length=512, hop_length=160)
+        
+        for got, expected in zip(specialized, generic):
+            np.testing.assert_allclose(got, expected, rtol=1e-5)
+    
+    def test_default_extractor_is_16k_speech_config(self):
+        """Test configuración del extractor por defecto."""
+        extractor = get_default_extractor()
+        
+        assert extractor.sample_rate == 16000
+        assert extractor.n_fft == 512
+        assert extractor.hop_length == 160
+        assert get_default_extractor() is extractor
@@ -7,15 +7,18 @@ PLUS Feature 5: Diferenciación de Hablantes
 
 import pytest
 import asyncio
-import tempfile
-import os
-import json
+import orjson
+import re
 import time
+from collections import defaultdict
+import numpy as np
 from unittest.mock import Mock, patch, AsyncMock
 from fastapi.testclient import TestClient
 
 from app.main import app
-from app.services.speaker_service import get_speaker_service, diarize_audio_conversation
+from app.services.speaker_service import (
+    get_speaker_service, diarize_audio_conversation, batch_audio_files
+)
 from app.services.whisper_service import get_whisper_service
 from app.database.models import AudioTranscription
 from app.core.schemas import SpeakerType, DiarizationResult, TranscriptionResponse
@@ -24,13 +27,35 @@ from app.core.schemas import SpeakerType, DiarizationResult, TranscriptionRespon
 # Test client
 client = TestClient(app)
 
+# Audio en memoria: la diarización solo-texto no inspecciona las muestras
+_SR = 16000
+_SAMPLES = np.zeros(_SR, dtype=np.float32)
+_SHORT_SAMPLES = _SAMPLES[:80]
+
+# Conversación larga de referencia para los tests de performance
+_LONG_TRANSCRIPTION = """
+        Buenos días, ¿cómo se encuentra hoy? Me siento mejor doctor.
+        ¿El medicamento le ha funcionado? Sí, mucho mejor que antes.
+        ¿Ha tenido efectos secundarios? No doctor, todo bien.
+        """ * 20
+
+# Piso de tolerancia para los tests de performance: absorbe el ruido del scheduler
+# cuando la medición base es de pocos milisegundos
+_PERF_FLOOR_S = 0.05
+
+# Términos médicos claros, precompilados en una sola alternativa
+_MEDICAL_RE = re.compile(r"doctor|medicamento|duele", re.IGNORECASE)
+
+# Salidas de librosa mockeadas: se construyen una sola vez, los tests no inspeccionan los valores
+_MOCK_PITCH = np.array([150.0, 180.0], dtype=np.float32)  # Diferentes pitches
+
 
 class TestSpeakerTranscriptionIntegration:
     """Tests de integración entre speaker diarization y transcripción."""
     
     @patch('app.services.whisper_service.openai.Audio.transcribe')
     @pytest.mark.asyncio
-    async def test_transcription_with_speaker_diarization(self, mock_whisper):
+    async def test_transcription_with_speaker_diarization(self, mock_whisper, fake_wav_path):
         """Test integración completa: audio → transcripción → diarización."""
         # Mock Whisper API
         mock_response = Mock()
@@ -44,40 +69,31 @@ class TestSpeakerTranscriptionIntegration:
         """
         mock_whisper.return_value = mock_response
         
-        # Crear archivo de audio temporal
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            f.write(b"fake medical conversation audio")
-            audio_file = f.name
+        # 1. Transcribir audio
+        whisper_service = get_whisper_service()
+        transcription_result = await whisper_service.transcribe_audio(fake_wav_path, "test_conversation.wav")
         
-        try:
-            # 1. Transcribir audio
-            whisper_service = get_whisper_service()
-            transcription_result = await whisper_service.transcribe_audio(audio_file, "test_conversation.wav")
-            
-            assert transcription_result is not None
-            assert "doctor" in transcription_result.text.lower()
-            assert "duele" in transcription_result.text.lower()
-            
-            # 2. Realizar diarización
-            speaker_service = get_speaker_service()
-            diarization_result = await speaker_service.diarize_conversation(
-                audio_file, transcription_result.text, whisper_segments=None
-            )
-            
-            assert isinstance(diarization_result, DiarizationResult)
-            assert len(diarization_result.speaker_segments) > 0
-            
-            # Verificar que se identificaron ambos tipos de hablantes
-            speakers = [seg.speaker for seg in diarization_result.speaker_segments]
-            assert SpeakerType.PROMOTOR in speakers or SpeakerType.PACIENTE in speakers
-            
-            # Verificar estadísticas
-            stats = diarization_result.speaker_stats
-            assert stats.total_duration > 0
-            assert stats.speaker_changes >= 0
-            
-        finally:
-            os.unlink(audio_file)
+        assert transcription_result is not None
+        assert "doctor" in transcription_result.text.lower()
+        assert "duele" in transcription_result.text.lower()
+        
+        # 2. Realizar diarización
+        speaker_service = get_speaker_service()
+        diarization_result = await speaker_service.diarize_conversation(
+            fake_wav_path, transcription_result.text, whisper_segments=None
+        )
+        
+        assert isinstance(diarization_result, DiarizationResult)
+        assert len(diarization_result.speaker_segments) > 0
+        
+        # Verificar que se identificaron ambos tipos de hablantes
+        speakers = [seg.speaker for seg in diarization_result.speaker_segments]
+        assert SpeakerType.PROMOTOR in speakers or SpeakerType.PACIENTE in speakers
+        
+        # Verificar estadísticas
+        stats = diarization_result.speaker_stats
+        assert stats.total_duration > 0
+        assert stats.speaker_changes >= 0
     
     @patch('app.services.speaker_service.librosa')
     @patch('app.services.whisper_service.openai.Audio.transcribe')
@@ -91,12 +107,8 @@ class TestSpeakerTranscriptionIntegration:
         mock_whisper.return_value = mock_response
         
         # Mock librosa para análisis de audio
-        import numpy as np
-        mock_librosa.load.return_value = (np.random.random(16000), 16000)
-        mock_librosa.yin.return_value = np.array([150.0, 180.0])  # Diferentes pitches
-        mock_librosa.feature.rms.return_value = [np.array([0.1, 0.2])]
-        mock_librosa.feature.spectral_centroid.return_value = [np.array([1000, 1200])]
-        mock_librosa.feature.zero_crossing_rate.return_value = [np.array([0.1, 0.15])]
+        mock_librosa.load.return_value = (_SAMPLES, _SR)
+        mock_librosa.yin.return_value = _MOCK_PITCH
         
         # Simular segmentos de Whisper
         whisper_segments = [
@@ -104,26 +116,18 @@ class TestSpeakerTranscriptionIntegration:
             {"start": 3.0, "end": 6.0, "text": "Me duele la cabeza"}
         ]
         
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            f.write(b"fake stereo conversation")
-            audio_file = f.name
+        transcription = "Buenos días doctor. Me duele la cabeza."
         
-        try:
-            transcription = "Buenos días doctor. Me duele la cabeza."
-            
-            # Test diarización avanzada
-            diarization_result = await diarize_audio_conversation(
-                audio_file, transcription, whisper_segments
-            )
-            
-            assert isinstance(diarization_result, DiarizationResult)
-            assert len(diarization_result.speaker_segments) == 2
-            
-            # Verificar que usó características de audio
-            assert diarization_result.algorithm_version == "1.0"
-            
-        finally:
-            os.unlink(audio_file)
+        # Test diarización avanzada (librosa.load está mockeado: la ruta no se abre)
+        diarization_result = await diarize_audio_conversation(
+            "conversation.wav", transcription, whisper_segments
+        )
+        
+        assert isinstance(diarization_result, DiarizationResult)
+        assert len(diarization_result.speaker_segments) == 2
+        
+        # Verificar que usó características de audio
+        assert diarization_result.algorithm_version == "1.0"
     
     @pytest.mark.asyncio
     async def test_speaker_diarization_with_database_integration(self):
@@ -138,35 +142,30 @@ class TestSpeakerTranscriptionIntegration:
         Sí, mucho mejor que antes.
         """
         
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            f.write(b"conversation for db test")
-            audio_file = f.name
+        # Realizar diarización
+        diarization_result = await get_speaker_service().diarize_samples(
+            _SAMPLES, _SR, transcription_text, whisper_segments=None
+        )
         
-        try:
-            # Realizar diarización
-            diarization_result = await diarize_audio_conversation(
-                audio_file, transcription_text, whisper_segments=None
-            )
-            
-            # Simular almacenamiento en base de datos
-            # (En implementación real esto se haría en el endpoint de upload)
-            speaker_data = {
-                "segments": [seg.dict() for seg in diarization_result.speaker_segments],
-                "stats": diarization_result.speaker_stats.dict()
-            }
-            
-            # Verificar que los datos son serializables a JSON
-            json_data = json.dumps(speaker_data, default=str)
-            assert json_data is not None
-            
-            # Verificar que se pueden deserializar
-            loaded_data = json.loads(json_data)
-            assert "segments" in loaded_data
-            assert "stats" in loaded_data
-            assert len(loaded_data["segments"]) == len(diarization_result.speaker_segments)
-            
-        finally:
-            os.unlink(audio_file)
+        # Simular almacenamiento en base de datos
+        # (En implementación real esto se haría en el endpoint de upload)
+        # orjson serializa enums, numpy y datetimes de forma nativa, sin default=str
+        speaker_data = {
+            "speaker_segments": [
+                segment.model_dump() for segment in diarization_result.iter_segments()
+            ],
+            "speaker_stats": diarization_result.speaker_stats.model_dump()
+        }
+        json_bytes = orjson.dumps(
+            speaker_data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC
+        )
+        assert json_bytes is not None
+        
+        # Verificar que se pueden deserializar
+        loaded_data = orjson.loads(json_bytes)
+        assert "speaker_segments" in loaded_data
+        assert "speaker_stats" in loaded_data
+        assert len(loaded_data["speaker_segments"]) == len(diarization_result.speaker_segments)
 
 
 class TestSpeakerChatIntegration:
@@ -206,16 +205,13 @@ class TestSpeakerChatIntegration:
         # Verificar estructura compatible con chat
         assert "speaker_segments" in speaker_data
         
-        # Simular extracción de información por hablante
-        promotor_text = " ".join([
-            seg["text"] for seg in speaker_data["speaker_segments"] 
-            if seg["speaker"] == "promotor"
-        ])
+        # Simular extracción de información por hablante (una sola pasada)
+        buckets = defaultdict(list)
+        for seg in speaker_data["speaker_segments"]:
+            buckets[seg["speaker"]].append(seg["text"])
         
-        paciente_text = " ".join([
-            seg["text"] for seg in speaker_data["speaker_segments"] 
-            if seg["speaker"] == "paciente"
-        ])
+        promotor_text = " ".join(buckets["promotor"])
+        paciente_text = " ".join(buckets["paciente"])
         
         assert "medicamento" in promotor_text.lower()
         assert "mejor" in paciente_text.lower()
@@ -246,16 +242,24 @@ class TestSpeakerChatIntegration:
             ]
         }
         
-        # Simular extracción de contexto específico por hablante
-        def extract_speaker_context(data, speaker_type):
-            segments = [s for s in data["speaker_segments"] if s["speaker"] == speaker_type]
+        # Simular extracción de contexto por hablante: texto y confianza en una sola pasada
+        def extract_speaker_contexts(data):
+            buckets = defaultdict(list)
+            conf_sums = defaultdict(float)
+            for s in data["speaker_segments"]:
+                buckets[s["speaker"]].append(s["text"])
+                conf_sums[s["speaker"]] += s["confidence"]
             return {
-                "text": " ".join([s["text"] for s in segments]),
-                "confidence": sum([s["confidence"] for s in segments]) / len(segments) if segments else 0
+                speaker: {
+                    "text": " ".join(texts),
+                    "confidence": conf_sums[speaker] / len(texts)
+                }
+                for speaker, texts in buckets.items()
             }
         
-        promotor_context = extract_speaker_context(conversation_with_speakers, "promotor")
-        paciente_context = extract_speaker_context(conversation_with_speakers, "paciente")
+        contexts = extract_speaker_contexts(conversation_with_speakers)
+        promotor_context = contexts["promotor"]
+        paciente_context = contexts["paciente"]
         
         assert promotor_context["text"] != ""
         assert paciente_context["text"] != ""
@@ -276,115 +280,68 @@ class TestSpeakerUploadEndpointIntegration:
         
         mock_process.side_effect = mock_transcription_with_speakers
         
-        # Crear archivo de audio temporal
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            f.write(b"test audio for speaker integration")
-            audio_file = f.name
-        
-        try:
-            # Upload audio
-            with open(audio_file, 'rb') as f:
-                response = client.post(
-                    "/api/v1/upload-audio",
-                    files={"file": ("test_conversation.wav", f, "audio/wav")}
-                )
-            
-            # Verificar respuesta exitosa
-            assert response.status_code == 200
-            data = response.json()
-            
-            assert "transcription_id" in data
-            assert data["filename"] == "test_conversation.wav"
-            assert data["status"] == "pending"
-            
-            # En implementación real, verificaríamos que se procesó con speakers
-            
-        finally:
-            os.unlink(audio_file)
+        # Upload audio directamente desde memoria
+        response = client.post(
+            "/api/v1/upload-audio",
+            files={"file": ("test_conversation.wav", b"test audio for speaker integration", "audio/wav")}
+        )
+        
+        # Verificar respuesta exitosa
+        assert response.status_code == 200
+        data = response.json()
+        
+        assert "transcription_id" in data
+        assert data["filename"] == "test_conversation.wav"
+        assert data["status"] == "pending"
+        
+        # En implementación real, verificaríamos que se procesó con speakers
 
 
 class TestSpeakerPerformanceIntegration:
     """Tests de performance para integración de speakers."""
     
     @pytest.mark.asyncio
-    async def test_diarization_performance_with_transcription(self):
+    async def test_diarization_performance_with_transcription(self, speaker_service_singleton, diarization_baseline_s):
         """Test performance del flujo completo transcripción + diarización."""
-        import time
+        start_ns = time.perf_counter_ns()
         
-        # Simular transcripción larga
-        long_transcription = """
-        Buenos días, ¿cómo se encuentra hoy? Me siento mejor doctor.
-        ¿El medicamento le ha funcionado? Sí, mucho mejor que antes.
-        ¿Ha tenido efectos secundarios? No doctor, todo bien.
-        """ * 20  # Conversación larga
+        # Procesar diarización
+        result = await speaker_service_singleton.diarize_samples(
+            _SAMPLES, _SR, _LONG_TRANSCRIPTION, whisper_segments=None
+        )
         
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            f.write(b"long conversation audio")
-            audio_file = f.name
+        elapsed_s = (time.perf_counter_ns() - start_ns) / 1e9
         
-        try:
-            start_time = time.time()
-            
-            # Procesar diarización
-            result = await diarize_audio_conversation(
-                audio_file, long_transcription, whisper_segments=None
-            )
-            
-            end_time = time.time()
-            processing_time = end_time - start_time
-            
-            # Debería completarse en tiempo razonable
-            assert processing_time < 10.0  # 10 segundos max
-            assert isinstance(result, DiarizationResult)
-            assert len(result.speaker_segments) > 10  # Muchos segmentos
-            
-        finally:
-            os.unlink(audio_file)
+        # Debería tardar lo mismo que la medición base, sin regresiones
+        assert elapsed_s < max(diarization_baseline_s * 3, _PERF_FLOOR_S)
+        assert isinstance(result, DiarizationResult)
+        assert len(result.speaker_segments) > 10  # Muchos segmentos
     
     @pytest.mark.asyncio
-    async def test_concurrent_speaker_processing(self):
-        """Test procesamiento concurrente de múltiples diarizaciones."""
-        import asyncio
-        
-        # Crear múltiples archivos de audio
-        audio_files = []
-        transcriptions = []
-        
-        for i in range(3):
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-                f.write(f"audio content {i}".encode())
-                audio_files.append(f.name)
-                transcriptions.append(f"Buenos días doctor {i}. Me duele la cabeza.")
-        
-        try:
-            start_time = time.time()
-            
-            # Procesar concurrentemente
-            tasks = []
-            for audio_file, transcription in zip(audio_files, transcriptions):
-                task = diarize_audio_conversation(audio_file, transcription, None)
-                tasks.append(task)
-            
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            end_time = time.time()
-            total_time = end_time - start_time
-            
-            # Verificar resultados
-            assert len(results) == 3
-            for result in results:
-                assert not isinstance(result, Exception)
-                assert isinstance(result, DiarizationResult)
-            
-            # Procesamiento concurrente debería ser eficiente
-            assert total_time < 15.0  # 15 segundos max para 3 archivos
-            
-        finally:
-            for audio_file in audio_files:
-                try:
-                    os.unlink(audio_file)
-                except FileNotFoundError:
-                    pass
+    async def test_concurrent_speaker_processing(self, speaker_service_singleton, diarization_baseline_s):
+        """Test procesamiento de múltiples diarizaciones en un solo lote."""
+        # Tres audios de distinta duración apilados en un único arreglo con padding
+        padded, lengths = batch_audio_files(
+            [np.zeros(int(_SR * d), dtype=np.float32) for d in (0.5, 1.0, 1.5)]
+        )
+        transcriptions = [f"Buenos días doctor {i}. Me duele la cabeza." for i in range(3)]
+        
+        start_ns = time.perf_counter_ns()
+        
+        # Una única llamada para todo el lote
+        results = await speaker_service_singleton.diarize_samples_batch(
+            padded, lengths, _SR, transcriptions
+        )
+        
+        elapsed_s = (time.perf_counter_ns() - start_ns) / 1e9
+        
+        # Verificar resultados
+        assert len(results) == 3
+        for result in results:
+            assert isinstance(result, DiarizationResult)
+        
+        # Tres conversaciones cortas no deberían costar más que tres veces la larga de referencia
+        assert elapsed_s < max(diarization_baseline_s * 3, _PERF_FLOOR_S)
 
 
 class TestSpeakerErrorHandlingIntegration:
@@ -393,39 +350,26 @@ class TestSpeakerErrorHandlingIntegration:
     @pytest.mark.asyncio
     async def test_diarization_with_empty_transcription(self):
         """Test diarización con transcripción vacía."""
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            f.write(b"audio content")
-            audio_file = f.name
+        # Transcripción vacía
+        result = await get_speaker_service().diarize_samples(_SAMPLES, _SR, "", None)
         
-        try:
-            # Transcripción vacía
-            result = await diarize_audio_conversation(audio_file, "", None)
-            
-            # Debería manejar gracefully
-            assert isinstance(result, DiarizationResult)
-            # Puede tener segmentos vacíos o un segmento unknown
-            
-        finally:
-            os.unlink(audio_file)
+        # Debería manejar gracefully
+        assert isinstance(result, DiarizationResult)
+        # Puede tener segmentos vacíos o un segmento unknown
     
     @pytest.mark.asyncio
     async def test_diarization_with_very_short_audio(self):
         """Test diarización con audio muy corto."""
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            f.write(b"short")  # Archivo muy pequeño
-            audio_file = f.name
+        short_transcription = "Hola."
         
-        try:
-            short_transcription = "Hola."
-            
-            result = await diarize_audio_conversation(audio_file, short_transcription, None)
-            
-            assert isinstance(result, DiarizationResult)
-            # Debería tener al menos un segmento
-            assert len(result.speaker_segments) >= 1
-            
-        finally:
-            os.unlink(audio_file)
+        # Audio muy corto: 5ms de muestras
+        result = await get_speaker_service().diarize_samples(
+            _SHORT_SAMPLES, _SR, short_transcription, None
+        )
+        
+        assert isinstance(result, DiarizationResult)
+        # Debería tener al menos un segmento
+        assert len(result.speaker_segments) >= 1
     
     @pytest.mark.asyncio
     async def test_diarization_with_audio_processing_error(self):
@@ -434,24 +378,16 @@ class TestSpeakerErrorHandlingIntegration:
             # Mock librosa que falla
             mock_librosa.load.side_effect = Exception("Audio processing error")
             
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-                f.write(b"problematic audio")
-                audio_file = f.name
+            transcription = "Buenos días doctor. Me duele la cabeza."
+            whisper_segments = [{"start": 0, "end": 5, "text": transcription}]
+            
+            # Debería hacer fallback a solo texto (la ruta nunca se abre)
+            result = await diarize_audio_conversation(
+                "problematic.wav", transcription, whisper_segments
+            )
             
-            try:
-                transcription = "Buenos días doctor. Me duele la cabeza."
-                whisper_segments = [{"start": 0, "end": 5, "text": transcription}]
-                
-                # Debería hacer fallback a solo texto
-                result = await diarize_audio_conversation(
-                    audio_file, transcription, whisper_segments
-                )
-                
-                assert isinstance(result, DiarizationResult)
-                assert len(result.speaker_segments) > 0
-                
-            finally:
-                os.unlink(audio_file)
+            assert isinstance(result, DiarizationResult)
+            assert len(result.speaker_segments) > 0
 
 
 class TestSpeakerDataConsistency:
@@ -467,35 +403,27 @@ class TestSpeakerDataConsistency:
         ¿Desde cuándo tiene este dolor?
         """
         
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            f.write(b"conversation audio")
-            audio_file = f.name
+        result = await get_speaker_service().diarize_samples(_SAMPLES, _SR, transcription, None)
         
-        try:
-            result = await diarize_audio_conversation(audio_file, transcription, None)
-            
-            segments = result.speaker_segments
-            
-            # Verificar consistencia temporal
-            for i in range(len(segments) - 1):
-                current = segments[i]
-                next_seg = segments[i + 1]
-                
-                # Cada segmento debe tener start < end
-                assert current.start_time < current.end_time
-                
-                # Los segmentos deberían estar en orden cronológico
-                assert current.start_time <= next_seg.start_time
-            
-            # Verificar que las estadísticas son consistentes
-            stats = result.speaker_stats
-            total_speaker_time = stats.promotor_time + stats.paciente_time + stats.unknown_time
+        segments = result.speaker_segments
+        
+        # Verificar consistencia temporal
+        for i in range(len(segments) - 1):
+            current = segments[i]
+            next_seg = segments[i + 1]
             
-            # El tiempo total debería ser razonable
-            assert total_speaker_time <= stats.total_duration * 1.1  # 10% tolerance
+            # Cada segmento debe tener start < end
+            assert current.start_time < current.end_time
             
-        finally:
-            os.unlink(audio_file)
+            # Los segmentos deberían estar en orden cronológico
+            assert current.start_time <= next_seg.start_time
+        
+        # Verificar que las estadísticas son consistentes
+        stats = result.speaker_stats
+        total_speaker_time = stats.promotor_time + stats.paciente_time + stats.unknown_time
+        
+        # El tiempo total debería ser razonable
+        assert total_speaker_time <= stats.total_duration * 1.1  # 10% tolerance
     
     @pytest.mark.asyncio
     async def test_speaker_confidence_consistency(self):
@@ -507,46 +435,31 @@ class TestSpeakerDataConsistency:
         No doctor, esperé a consultarle.
         """
         
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            f.write(b"clear conversation")
-            audio_file = f.name
+        result = await get_speaker_service().diarize_samples(_SAMPLES, _SR, transcription, None)
         
-        try:
-            result = await diarize_audio_conversation(audio_file, transcription, None)
-            
-            # Verificar que todas las confianzas están en rango válido
-            for segment in result.speaker_segments:
-                assert 0.0 <= segment.confidence <= 1.0
-            
-            # Segmentos con patrones médicos claros deberían tener mayor confianza
-            medical_segments = [
-                s for s in result.speaker_segments 
-                if any(term in s.text.lower() for term in ["doctor", "medicamento", "duele"])
-            ]
-            
-            if medical_segments:
-                avg_medical_confidence = sum(s.confidence for s in medical_segments) / len(medical_segments)
-                # Los segmentos médicos deberían tener confianza razonable
-                assert avg_medical_confidence > 0.3
-            
-        finally:
-            os.unlink(audio_file)
+        # Verificar que todas las confianzas están en rango válido
+        for segment in result.speaker_segments:
+            assert 0.0 <= segment.confidence <= 1.0
+        
+        # Segmentos con patrones médicos claros deberían tener mayor confianza
+        medical_segments = [s for s in result.speaker_segments if _MEDICAL_RE.search(s.text)]
+        
+        if medical_segments:
+            avg_medical_confidence = sum(s.confidence for s in medical_segments) / len(medical_segments)
+            # Los segmentos médicos deberían tener confianza razonable
+            assert avg_medical_confidence > 0.3
 
 
 # Fixtures para tests de integración
-@pytest.fixture
-def sample_medical_audio_file():
-    """Fixture para archivo de audio médico simulado."""
-    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-        f.write(b"simulated medical conversation audio content")
-        temp_file = f.name
-    
-    yield temp_file
+@pytest.fixture(scope="session")
+async def diarization_baseline_s(speaker_service_singleton):
+    """Tiempo base (s) de diarizar la conversación larga, medido con el servicio ya caliente."""
+    # Primera pasada de calentamiento: thread pool, regex y logging inicializados
+    await speaker_service_singleton.diarize_samples(_SAMPLES, _SR, _LONG_TRANSCRIPTION, None)
     
-    try:
-        os.unlink(temp_file)
-    except FileNotFoundError:
-        pass
+    start_ns = time.perf_counter_ns()
+    await speaker_service_singleton.diarize_samples(_SAMPLES, _SR, _LONG_TRANSCRIPTION, None)
+    return (time.perf_counter_ns() - start_ns) / 1e9
 
 
 @pytest.fixture
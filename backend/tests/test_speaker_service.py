@@ -7,16 +7,16 @@ PLUS Feature 5: Diferenciación de Hablantes
 
 import pytest
 import asyncio
-import tempfile
-import os
+import threading
 import json
 import numpy as np
 from unittest.mock import Mock, patch, AsyncMock
 
 from app.services.speaker_service import (
     get_speaker_service, SpeakerService, SpeakerDiarizationError,
-    diarize_audio_conversation
+    diarize_audio_conversation, batch_audio_files
 )
+from app.services.speaker_features import get_default_extractor, make_extractor
 from app.core.schemas import (
     SpeakerSegment, SpeakerStats, DiarizationResult, 
     SpeakerType, TranscriptionResponse
@@ -38,6 +38,10 @@ class TestSpeakerService:
         service2 = get_speaker_service()
         assert service1 is service2
     
+    def test_default_feature_extractor_is_specialized(self):
+        """Test que el servicio use el extractor especializado a 16 kHz."""
+        assert self.speaker_service._extract is get_default_extractor()
+    
     def test_analyze_text_content_promotor_patterns(self):
         """Test análisis de patrones de texto del promotor."""
         promotor_texts = [
@@ -174,6 +178,27 @@ class TestSpeakerService:
         assert stats.total_duration == 10.0
         assert stats.average_segment_length > 0
     
+    def test_calculate_speaker_stats_unknown_and_multiple(self):
+        """Test que UNKNOWN sume tiempo propio pero no cuente como hablante."""
+        segments = [
+            SpeakerSegment(speaker=SpeakerType.UNKNOWN, text="Mmm", start_time=0.0,
+                           end_time=1.0, confidence=0.3, word_count=1),
+            SpeakerSegment(speaker=SpeakerType.MULTIPLE, text="Sí, claro", start_time=1.0,
+                           end_time=2.5, confidence=0.5, word_count=2),
+            SpeakerSegment(speaker=SpeakerType.UNKNOWN, text="Eh", start_time=2.5,
+                           end_time=3.0, confidence=0.3, word_count=1)
+        ]
+        
+        stats = self.speaker_service._calculate_speaker_stats(segments)
+        
+        assert stats.total_speakers == 1
+        assert stats.unknown_time == pytest.approx(1.5)
+        assert stats.promotor_time == 0.0
+        assert stats.paciente_time == 0.0
+        assert stats.speaker_changes == 2
+        assert stats.total_duration == 3.0
+        assert stats.average_segment_length == pytest.approx(1.0)
+    
     def test_calculate_speaker_stats_empty(self):
         """Test cálculo de estadísticas con lista vacía."""
         stats = self.speaker_service._calculate_speaker_stats([])
@@ -182,8 +207,28 @@ class TestSpeakerService:
         assert stats.total_duration == 0.0
         assert stats.speaker_changes == 0
     
-    @pytest.mark.asyncio
-    async def test_diarize_text_only_basic(self):
+    def test_diarization_result_iter_segments(self):
+        """Test recorrido perezoso de segmentos, con y sin filtro por hablante."""
+        segments = [
+            SpeakerSegment(speaker=SpeakerType.PROMOTOR, text="¿Cómo se siente?",
+                           start_time=0.0, end_time=3.0, confidence=0.9, word_count=3),
+            SpeakerSegment(speaker=SpeakerType.PACIENTE, text="Me duele la cabeza",
+                           start_time=3.5, end_time=8.0, confidence=0.8, word_count=4)
+        ]
+        result = DiarizationResult(
+            speaker_segments=segments,
+            speaker_stats=self.speaker_service._calculate_speaker_stats(segments),
+            processing_time_ms=1,
+            confidence_threshold=0.6
+        )
+        
+        iterator = result.iter_segments()
+        
+        assert not isinstance(iterator, list)
+        assert list(iterator) == segments
+        assert list(result.iter_segments(SpeakerType.PACIENTE)) == [segments[1]]
+    
+    def test_diarize_text_only_basic(self):
         """Test diarización usando solo texto."""
         transcription = """
         Buenos días, ¿cómo se siente hoy?
@@ -194,7 +239,7 @@ class TestSpeakerService:
         Gracias doctor.
         """
         
-        segments = await self.speaker_service._diarize_text_only(transcription)
+        segments = self.speaker_service._segments_text_only(transcription)
         
         assert len(segments) > 0
         assert all(isinstance(seg, SpeakerSegment) for seg in segments)
@@ -204,8 +249,7 @@ class TestSpeakerService:
         speakers = [seg.speaker for seg in segments]
         assert SpeakerType.PROMOTOR in speakers or SpeakerType.PACIENTE in speakers
     
-    @pytest.mark.asyncio
-    async def test_diarize_text_only_medical_conversation(self):
+    def test_diarize_text_only_medical_conversation(self):
         """Test diarización con conversación médica realista."""
         medical_conversation = """
         Buenos días señora García, ¿cómo se encuentra hoy?
@@ -218,7 +262,7 @@ class TestSpeakerService:
         Perfecto doctor, ¿hay algo más que deba evitar?
         """
         
-        segments = await self.speaker_service._diarize_text_only(medical_conversation)
+        segments = self.speaker_service._segments_text_only(medical_conversation)
         
         # Verificar que se identificaron roles correctamente
         promotor_segments = [s for s in segments if s.speaker == SpeakerType.PROMOTOR]
@@ -237,15 +281,13 @@ class TestSpeakerService:
     @patch('app.services.speaker_service.librosa')
     @patch('app.services.speaker_service.KMeans')
     @patch('app.services.speaker_service.StandardScaler')
-    @pytest.mark.asyncio
-    async def test_diarize_with_audio_and_text_success(self, mock_scaler, mock_kmeans, mock_librosa):
+    def test_diarize_with_audio_and_text_success(
+        self, mock_scaler, mock_kmeans, mock_librosa, fake_wav_path, spy_extractor
+    ):
         """Test diarización híbrida exitosa con audio y texto."""
         # Mock librosa
         mock_librosa.load.return_value = (np.random.random(16000), 16000)  # 1 segundo de audio
         mock_librosa.yin.return_value = np.array([150.0, 155.0, 160.0])  # Pitch values
-        mock_librosa.feature.rms.return_value = [np.array([0.1, 0.15, 0.12])]
-        mock_librosa.feature.spectral_centroid.return_value = [np.array([1000, 1100, 1050])]
-        mock_librosa.feature.zero_crossing_rate.return_value = [np.array([0.1, 0.12, 0.11])]
         
         # Mock clustering
         mock_kmeans_instance = Mock()
@@ -264,52 +306,240 @@ class TestSpeakerService:
             {"start": 7.5, "end": 10.0, "text": "¿Desde cuándo tiene este dolor?"}
         ]
         
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            f.write(b"fake audio content")
-            audio_file = f.name
+        transcription = "Buenos días, ¿cómo se siente? Me duele la cabeza doctor. ¿Desde cuándo tiene este dolor?"
+        
+        service = SpeakerService(extractor=spy_extractor)
+        segments = service._segments_with_audio_and_text(
+            fake_wav_path, transcription, whisper_segments
+        )
+        
+        assert len(segments) == 3
+        assert all(isinstance(seg, SpeakerSegment) for seg in segments)
+        assert all(0 <= seg.confidence <= 1 for seg in segments)
+        spy_extractor.assert_called()
+    
+    @patch('app.services.speaker_service.librosa')
+    @pytest.mark.asyncio
+    async def test_diarize_samples_skips_audio_load(self, mock_librosa):
+        """Test diarización sobre muestras en memoria sin cargar archivo."""
+        mock_librosa.yin.return_value = np.array([150.0, 155.0, 160.0])
+        
+        whisper_segments = [
+            {"start": 0.0, "end": 0.5, "text": "Buenos días, ¿cómo se siente?"},
+            {"start": 0.5, "end": 1.0, "text": "Me duele la cabeza doctor"}
+        ]
+        samples = np.zeros(16000, dtype=np.float32)
+        
+        result = await self.speaker_service.diarize_samples(
+            samples, 16000, "Buenos días, ¿cómo se siente? Me duele la cabeza doctor", whisper_segments
+        )
+        
+        assert isinstance(result, DiarizationResult)
+        assert len(result.speaker_segments) == 2
+        mock_librosa.load.assert_not_called()
+    
+    def test_batch_audio_files_pads_to_longest(self):
+        """Test que el lote quede con padding a la forma de onda más larga."""
+        waveforms = [np.ones(3), np.ones(5), np.ones(1)]
+        
+        padded, lengths = batch_audio_files(waveforms)
         
-        try:
-            transcription = "Buenos días, ¿cómo se siente? Me duele la cabeza doctor. ¿Desde cuándo tiene este dolor?"
-            
-            segments = await self.speaker_service._diarize_with_audio_and_text(
-                audio_file, transcription, whisper_segments
+        assert padded.shape == (3, 5)
+        assert padded.dtype == np.float32
+        assert lengths.tolist() == [3, 5, 1]
+        assert padded[0, 3:].sum() == 0
+        assert padded[1].sum() == 5
+    
+    @pytest.mark.asyncio
+    async def test_diarize_samples_batch_trims_padding(self):
+        """Test que cada conversación del lote se diarice sin su padding."""
+        padded, lengths = batch_audio_files([np.zeros(160), np.zeros(320)])
+        
+        with patch.object(self.speaker_service, 'diarize_conversation_batch',
+                          new_callable=AsyncMock) as mock_batch:
+            await self.speaker_service.diarize_samples_batch(
+                padded, lengths, 16000, ["Hola doctor.", "Buenos días."]
             )
-            
-            assert len(segments) == 3
-            assert all(isinstance(seg, SpeakerSegment) for seg in segments)
-            assert all(0 <= seg.confidence <= 1 for seg in segments)
-            
-        finally:
-            os.unlink(audio_file)
+        
+        items = mock_batch.call_args[0][0]
+        assert [len(audio[0]) for audio, _, _ in items] == [160, 320]
+        assert [text for _, text, _ in items] == ["Hola doctor.", "Buenos días."]
     
     @pytest.mark.asyncio
-    async def test_diarize_conversation_full_workflow(self):
-        """Test flujo completo de diarización."""
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            f.write(b"fake audio content")
-            audio_file = f.name
-        
-        try:
-            transcription = """
-            Buenos días, ¿cómo se encuentra hoy?
-            Me duele mucho la cabeza desde ayer.
-            ¿Ha tomado algún medicamento?
-            No doctor, esperé a venir a consultarle.
-            """
-            
-            # Sin segmentos de Whisper (fallback a solo texto)
-            result = await self.speaker_service.diarize_conversation(
-                audio_file, transcription, whisper_segments=None
+    async def test_diarize_conversation_batch_runs_items_in_parallel(self):
+        """Test que cada conversación del lote ocupe su propio hilo del thread pool."""
+        # Ambas conversaciones deben estar en curso a la vez para cruzar la barrera
+        barrier = threading.Barrier(2, timeout=5)
+        
+        def fake_diarize_sync(audio_source, transcription, whisper_segments, cache="default"):
+            barrier.wait()
+            return transcription
+        
+        items = [("a.wav", "uno", None), ("b.wav", "dos", None, None)]
+        with patch.object(self.speaker_service, '_diarize_sync', side_effect=fake_diarize_sync) as mock_sync:
+            results = await self.speaker_service.diarize_conversation_batch(items)
+        
+        assert results == ["uno", "dos"]
+        assert ("b.wav", "dos", None, None) in [c.args for c in mock_sync.call_args_list]
+    
+    @pytest.mark.asyncio
+    async def test_diarize_conversation_batch_return_exceptions(self):
+        """Test que los errores de diarización queden en la posición de su conversación."""
+        error = SpeakerDiarizationError("audio corrupto")
+        
+        def fake_diarize_sync(audio_source, transcription, whisper_segments, cache="default"):
+            if audio_source == "b.wav":
+                raise error
+            return "ok"
+        
+        with patch.object(self.speaker_service, '_diarize_sync', side_effect=fake_diarize_sync):
+            results = await self.speaker_service.diarize_conversation_batch(
+                [("a.wav", "uno", None), ("b.wav", "dos", None)], return_exceptions=True
             )
-            
-            assert isinstance(result, DiarizationResult)
-            assert len(result.speaker_segments) > 0
-            assert isinstance(result.speaker_stats, SpeakerStats)
-            assert result.processing_time_ms > 0
-            assert result.algorithm_version == "1.0"
-            
-        finally:
-            os.unlink(audio_file)
+        
+        assert results == ["ok", error]
+    
+    @pytest.mark.asyncio
+    async def test_diarize_runs_off_event_loop_thread(self):
+        """Test que la diarización CPU-bound no bloquee el hilo del event loop."""
+        loop_thread = threading.get_ident()
+        worker_threads = []
+        segments_text_only = self.speaker_service._segments_text_only
+        
+        def recording_segments(transcription):
+            worker_threads.append(threading.get_ident())
+            return segments_text_only(transcription)
+        
+        with patch.object(self.speaker_service, '_segments_text_only', side_effect=recording_segments):
+            result = await self.speaker_service.diarize_samples(
+                np.zeros(16000, dtype=np.float32), 16000, "Buenos días doctor. Me duele la cabeza."
+            )
+        
+        assert isinstance(result, DiarizationResult)
+        assert worker_threads and worker_threads[0] != loop_thread
+    
+    @patch('app.services.speaker_service.librosa')
+    def test_audio_loaded_in_bounded_windows(self, mock_librosa):
+        """Test que el audio se cargue por ventanas acotadas y no completo."""
+        mock_librosa.load.return_value = (np.zeros(16000, dtype=np.float32), 16000)
+        whisper_segments = [
+            {"start": 0.0, "end": 10.0, "text": "Buenos días, ¿cómo se siente?"},
+            {"start": 10.0, "end": 25.0, "text": "Me duele la cabeza doctor"},
+            {"start": 25.0, "end": 40.0, "text": "¿Desde cuándo tiene este dolor?"},
+            {"start": 40.0, "end": 65.0, "text": "Desde hace una semana"},
+            {"start": 65.0, "end": 70.0, "text": "Vamos a revisar su presión"}
+        ]
+        
+        segments = self.speaker_service._segments_with_audio_and_text(
+            "conversation.wav", "transcripción", whisper_segments
+        )
+        
+        assert len(segments) == 5
+        offsets = [c.kwargs["offset"] for c in mock_librosa.load.call_args_list]
+        durations = [c.kwargs["duration"] for c in mock_librosa.load.call_args_list]
+        assert offsets == [0.0, 25.0, 40.0]
+        assert max(durations) <= self.settings.SPEAKER_AUDIO_WINDOW_SECONDS
+    
+    @patch('app.services.speaker_service.librosa')
+    def test_silent_segments_skip_feature_extraction(self, mock_librosa, spy_extractor):
+        """Test que los segmentos en silencio no pasen por la extracción de características."""
+        audio = np.zeros(32000, dtype=np.float32)
+        audio[16000:] = 0.5  # Solo el segundo segmento tiene energía
+        mock_librosa.yin.return_value = np.array([150.0, 155.0, 160.0])
+        whisper_segments = [
+            {"start": 0.0, "end": 1.0, "text": "Buenos días, ¿cómo se siente?"},
+            {"start": 1.0, "end": 2.0, "text": "Me duele la cabeza doctor"}
+        ]
+        
+        service = SpeakerService(extractor=spy_extractor)
+        segments = service._segments_with_audio_and_text(
+            (audio, 16000), "transcripción", whisper_segments
+        )
+        
+        assert len(segments) == 2
+        assert mock_librosa.yin.call_count == 1
+        assert spy_extractor.call_count == 1
+    
+    def test_audio_features_use_configured_precision(self):
+        """Test que las muestras en memoria se conviertan a la precisión de trabajo."""
+        service = SpeakerService(feature_dtype=np.float32)
+        samples = np.zeros(32000, dtype=np.float64)
+        
+        window, sr = service._load_audio((samples, 16000), offset=1.0, duration=0.5)
+        
+        assert window.dtype == np.float32
+        assert len(window) == 8000
+        assert service._extract_audio_features(window[:100], sr).dtype == np.float32
+    
+    @patch('app.services.speaker_service.librosa')
+    def test_audio_features_cached_on_disk(self, mock_librosa, tmp_path, spy_extractor):
+        """Test que las características se reutilicen desde disco para el mismo audio."""
+        audio = np.full(32000, 0.5, dtype=np.float32)
+        mock_librosa.yin.return_value = np.array([150.0, 155.0, 160.0])
+        whisper_segments = [
+            {"start": 0.0, "end": 1.0, "text": "Buenos días, ¿cómo se siente?"},
+            {"start": 1.0, "end": 2.0, "text": "Me duele la cabeza doctor"}
+        ]
+        
+        service = SpeakerService(extractor=spy_extractor)
+        first = service._segments_with_audio_and_text(
+            (audio, 16000), "transcripción", whisper_segments, cache=str(tmp_path)
+        )
+        second = service._segments_with_audio_and_text(
+            (audio, 16000), "transcripción", whisper_segments, cache=str(tmp_path)
+        )
+        
+        assert len(list(tmp_path.glob("*.npz"))) == 1
+        assert mock_librosa.yin.call_count == 2  # Solo en la primera pasada
+        assert spy_extractor.call_count == 2
+        assert [seg.speaker for seg in first] == [seg.speaker for seg in second]
+        assert list(tmp_path.glob("*.tmp")) == []
+    
+    def test_feature_cache_key_includes_extractor_params(self, tmp_path):
+        """Test que extractores con distinta configuración no compartan caché."""
+        audio = (np.zeros(16000, dtype=np.float32), 16000)
+        whisper_segments = [{"start": 0.0, "end": 1.0, "text": "Hola"}]
+        other = SpeakerService(extractor=make_extractor(sr=16000, n_fft=1024, hop=256))
+        
+        path = self.speaker_service._feature_cache_path(audio, whisper_segments, str(tmp_path))
+        other_path = other._feature_cache_path(audio, whisper_segments, str(tmp_path))
+        
+        assert path != other_path
+    
+    @patch('app.services.speaker_service.StandardScaler', None)
+    @patch('app.services.speaker_service.KMeans')
+    @patch('app.services.speaker_service.MiniBatchKMeans')
+    def test_cluster_speakers_long_conversation_uses_minibatch(self, mock_minibatch, mock_kmeans):
+        """Test que conversaciones largas se agrupen con MiniBatchKMeans."""
+        mock_minibatch.return_value.fit_predict.return_value = np.zeros(1000, dtype=int)
+        audio_features = [np.zeros(6)] * 1000
+        
+        clusters = self.speaker_service._cluster_speakers(audio_features)
+        
+        assert len(clusters) == 1000
+        mock_minibatch.return_value.fit_predict.assert_called_once()
+        mock_kmeans.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_diarize_conversation_full_workflow(self, fake_wav_path):
+        """Test flujo completo de diarización."""
+        transcription = """
+        Buenos días, ¿cómo se encuentra hoy?
+        Me duele mucho la cabeza desde ayer.
+        ¿Ha tomado algún medicamento?
+        No doctor, esperé a venir a consultarle.
+        """
+        
+        # Sin segmentos de Whisper (fallback a solo texto)
+        result = await self.speaker_service.diarize_conversation(
+            fake_wav_path, transcription, whisper_segments=None
+        )
+        
+        assert isinstance(result, DiarizationResult)
+        assert len(result.speaker_segments) > 0
+        assert isinstance(result.speaker_stats, SpeakerStats)
+        assert result.processing_time_ms > 0
+        assert result.algorithm_version == "1.0"
     
     @pytest.mark.asyncio
     async def test_diarize_conversation_error_handling(self):
@@ -373,33 +603,24 @@ class TestSpeakerServiceDependencies:
     
     @patch('app.services.speaker_service.librosa', None)
     @pytest.mark.asyncio
-    async def test_diarization_fallback_to_text_only(self):
+    async def test_diarization_fallback_to_text_only(self, fake_wav_path):
         """Test fallback a solo texto cuando faltan dependencias de audio."""
         service = SpeakerService()
         
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            f.write(b"audio content")
-            audio_file = f.name
-        
-        try:
-            transcription = "Buenos días doctor. Me duele la cabeza."
-            whisper_segments = [{"start": 0, "end": 5, "text": transcription}]
-            
-            # Debería usar solo texto cuando faltan dependencias
-            result = await service.diarize_conversation(audio_file, transcription, whisper_segments)
-            
-            assert isinstance(result, DiarizationResult)
-            assert len(result.speaker_segments) > 0
-            
-        finally:
-            os.unlink(audio_file)
+        transcription = "Buenos días doctor. Me duele la cabeza."
+        whisper_segments = [{"start": 0, "end": 5, "text": transcription}]
+        
+        # Debería usar solo texto cuando faltan dependencias
+        result = await service.diarize_conversation(fake_wav_path, transcription, whisper_segments)
+        
+        assert isinstance(result, DiarizationResult)
+        assert len(result.speaker_segments) > 0
 
 
 class TestSpeakerServicePerformance:
     """Tests de performance para diarización."""
     
-    @pytest.mark.asyncio
-    async def test_diarization_performance_text_only(self):
+    def test_diarization_performance_text_only(self):
         """Test performance de diarización solo con texto."""
         import time
         
@@ -414,7 +635,7 @@ class TestSpeakerServicePerformance:
         service = get_speaker_service()
         
         start_time = time.time()
-        segments = await service._diarize_text_only(long_transcription)
+        segments = service._segments_text_only(long_transcription)
         end_time = time.time()
         
         processing_time = end_time - start_time
@@ -424,7 +645,7 @@ class TestSpeakerServicePerformance:
         assert len(segments) > 0
     
     @pytest.mark.asyncio
-    async def test_large_conversation_handling(self):
+    async def test_large_conversation_handling(self, fake_wav_path):
         """Test manejo de conversaciones muy largas."""
         # Crear conversación de ~50 intercambios
         conversation_parts = []
@@ -438,26 +659,17 @@ class TestSpeakerServicePerformance:
         
         service = get_speaker_service()
         
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            f.write(b"long audio content")
-            audio_file = f.name
-        
-        try:
-            result = await service.diarize_conversation(audio_file, long_conversation, None)
-            
-            assert isinstance(result, DiarizationResult)
-            assert len(result.speaker_segments) > 10  # Debería tener muchos segmentos
-            assert result.speaker_stats.speaker_changes > 5
-            
-        finally:
-            os.unlink(audio_file)
+        result = await service.diarize_conversation(fake_wav_path, long_conversation, None)
+        
+        assert isinstance(result, DiarizationResult)
+        assert len(result.speaker_segments) > 10  # Debería tener muchos segmentos
+        assert result.speaker_stats.speaker_changes > 5
 
 
 class TestSpeakerServiceAccuracy:
     """Tests de precisión para diarización."""
     
-    @pytest.mark.asyncio
-    async def test_medical_conversation_accuracy(self):
+    def test_medical_conversation_accuracy(self):
         """Test precisión con conversación médica típica."""
         medical_conversation = """
         Buenos días señora Martínez, tome asiento por favor.
@@ -473,7 +685,7 @@ class TestSpeakerServiceAccuracy:
         """
         
         service = get_speaker_service()
-        segments = await service._diarize_text_only(medical_conversation)
+        segments = service._segments_text_only(medical_conversation)
         
         # Analizar precisión
         promotor_segments = [s for s in segments if s.speaker == SpeakerType.PROMOTOR]
@@ -525,20 +737,5 @@ def sample_whisper_segments():
     ]
 
 
-@pytest.fixture
-def temp_audio_file():
-    """Fixture para archivo de audio temporal."""
-    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-        f.write(b"fake audio content for speaker diarization tests")
-        temp_file = f.name
-    
-    yield temp_file
-    
-    try:
-        os.unlink(temp_file)
-    except FileNotFoundError:
-        pass
-
-
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
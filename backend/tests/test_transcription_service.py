@@ -157,6 +157,7 @@ class TestWhisperService:
         assert isinstance(info["cuda_available"], bool)
     
     @pytest.mark.asyncio
+    @pytest.mark.xdist_group(name="fs_heavy")
     async def test_process_long_audio_file(self):
         """Test procesamiento de archivo de audio largo."""
         # Crear archivo "grande" simulado con header válido
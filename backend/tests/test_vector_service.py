@@ -11,6 +11,7 @@ import pytest
 import asyncio
 import tempfile
 import shutil
+import numpy as np
 from datetime import datetime
 from unittest.mock import Mock, patch, AsyncMock
 
@@ -283,6 +284,49 @@ class TestVectorStoreService:
                         unstructured_data=sample_conversation_data["unstructured_data"]
                     )
     
+    @pytest.mark.asyncio
+    async def test_query_embedding_memoization(self, mock_settings):
+        """Test que consultas repetidas reutilizan el embedding calculado."""
+        with patch('chromadb.PersistentClient'):
+            with patch('app.services.vector_service.SentenceTransformer') as mock_transformer:
+                mock_transformer.return_value.encode.return_value = np.array([0.1] * 384)
+                
+                service = VectorStoreService()
+                
+                first = await service._generate_query_embedding("pacientes con diabetes")
+                second = await service._generate_query_embedding("pacientes con diabetes")
+                
+                assert first == second
+                assert len(first) == 384
+                mock_transformer.return_value.encode.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_search_batch_shares_collection_read(self, mock_settings):
+        """Test que varias búsquedas por paciente comparten una sola lectura de la colección."""
+        with patch('chromadb.PersistentClient') as mock_client:
+            with patch('app.services.vector_service.SentenceTransformer'):
+                mock_collection = Mock()
+                mock_collection.get.return_value = {
+                    "documents": ["Consulta de Juan Pérez", "Consulta de María García"],
+                    "metadatas": [
+                        {"conversation_id": "conv-1", "patient_name": "Juan Pérez"},
+                        {"conversation_id": "conv-2", "patient_name": "María García"}
+                    ]
+                }
+                mock_client.return_value.get_or_create_collection.return_value = mock_collection
+
+                service = VectorStoreService()
+
+                results = await service.search_batch([
+                    {"type": "patient", "value": "Juan Pérez", "max_results": 5},
+                    {"type": "patient", "value": "María García", "max_results": 5}
+                ])
+
+                assert len(results) == 2
+                assert results[0][0]["conversation_id"] == "conv-1"
+                assert results[1][0]["conversation_id"] == "conv-2"
+                mock_collection.get.assert_called_once()
+
     def test_prepare_text_for_embedding(self, mock_settings):
         """Test preparación de texto para embedding."""
         with patch('chromadb.PersistentClient'):